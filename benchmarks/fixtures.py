@@ -0,0 +1,72 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import os
+import random
+from PIL import Image as PILImage, ImageDraw
+from grids import state
+
+
+def make_image(file, rng, size=(640, 480)):
+    img = PILImage.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(8):
+        x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+        x1, y1 = x0 + rng.randrange(1, 200), y0 + rng.randrange(1, 200)
+        draw.rectangle(
+            [x0, y0, x1, y1], fill=tuple(rng.randrange(256) for _ in range(3))
+        )
+    img.save(file, quality=85)
+
+
+def make_text(file, rng, lines=2000):
+    with open(file, "w") as f:
+        for line in range(lines):
+            words = " ".join(
+                "".join(chr(rng.randrange(97, 123)) for _ in range(rng.randrange(2, 9)))
+                for _ in range(rng.randrange(4, 16))
+            )
+            f.write("{:05d} {}\n".format(line, words))
+
+
+def make_fixtures(directory, cells, seed=0):
+    # files for a grid of cells, mixed images, text and nested
+    # grid xml without a thumbnail, the same for a given seed
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    images = []
+    for index in range(cells):
+        kind = index % 10
+        if kind < 6:
+            file = os.path.join(directory, "{:05d}.jpg".format(index))
+            if not os.path.isfile(file):
+                make_image(file, rng)
+            images.append(file)
+        elif kind < 9:
+            file = os.path.join(directory, "{:05d}.txt".format(index))
+            if not os.path.isfile(file):
+                make_text(file, rng)
+        else:
+            file = os.path.join(directory, "{:05d}.xml".format(index))
+            if not os.path.isfile(file):
+                children = images[-4:]
+                state.write_grid(
+                    file,
+                    "{:05d}.png".format(index),
+                    [
+                        {
+                            "source": child,
+                            "source_type": "file",
+                            "scroll_x": 0.5,
+                            "scroll_y": 0.5,
+                            "position": position,
+                        }
+                        for position, child in enumerate(children)
+                    ],
+                )
+        files.append(file)
+    return files
@@ -0,0 +1,399 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+# benchmarks of the grid save, load, render and input paths
+#
+#     python benchmarks/run.py -o results.json
+#
+# each size of synthetic grid runs the gui benchmarks in its
+# own process with an offscreen window, everything else runs
+# without kivy. xdg directories point at a temporary directory
+# so runs do not touch or depend on existing grids
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+
+def measure(name, function, repeat, cells=None, setup=None, per_call=1):
+    # seconds for each call of function, setup is not timed
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) / per_call)
+    return {
+        "name": name,
+        "cells": cells,
+        "repeat": repeat,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "max": max(times),
+    }
+
+
+def headless_benchmarks(files, cells, repeat, work_dir, db_host, db_port):
+    from lxml import etree
+    from grids import db, render, state
+    from grids.cache import TextureCache
+    from grids.hashing import ContentHasher
+    from grids.text import TextSource
+
+    results = []
+    cell_attributes = [
+        {
+            "source": file,
+            "source_type": "file",
+            "scroll_x": 0.5,
+            "scroll_y": 0.5,
+            "position": position,
+        }
+        for position, file in enumerate(reversed(files))
+    ]
+    grid_file = os.path.join(work_dir, "grid-{}.xml".format(cells))
+    state.write_grid(grid_file, "grid-{}.png".format(cells), cell_attributes)
+
+    # placeholders for every nested grid in the grid
+    nested = [file for file in files if file.endswith(".xml")]
+
+    def represent():
+        for file in nested:
+            render.grid_representation_img(etree.parse(file).getroot())
+
+    results.append(measure("grid_representation_img", represent, repeat, cells))
+    representations = render.RepresentationCache(
+        os.path.join(work_dir, "representations")
+    )
+
+    def represent_cached():
+        for file in nested:
+            representations.load(file)
+
+    represent_cached()
+    results.append(measure("representation_cache_hit", represent_cached, repeat, cells))
+    texture_cache = TextureCache(os.path.join(work_dir, "textures"))
+    render.render_grid(grid_file, work_dir, texture_cache, (800, 554))
+    results.append(
+        measure(
+            "render_grid",
+            lambda: render.render_grid(grid_file, work_dir, texture_cache, (800, 554)),
+            repeat,
+            cells,
+        )
+    )
+
+    text_file = next(file for file in files if file.endswith(".txt"))
+
+    def text_window():
+        text_source = TextSource(text_file)
+        text_source.lines(0, 64)
+        text_source.close()
+
+    results.append(measure("text_source_window", text_window, repeat, cells))
+
+    # windows of lines read as an open text cell scrolls
+    text_source = TextSource(text_file)
+    line_count = text_source.line_count()
+
+    def text_scroll():
+        for start in range(0, line_count, max(1, line_count // 16)):
+            text_source.lines(start, 64)
+
+    results.append(
+        measure("text_source_lines", text_scroll, repeat, cells, per_call=16)
+    )
+    text_source.close()
+
+    conn = db.connect(db_host, db_port)
+    thumbnail_bytes = os.urandom(256 * 1024)
+    results.append(
+        measure(
+            "db_save",
+            lambda: db.save(conn, thumbnail_bytes, "benchmark"),
+            repeat,
+            cells,
+        )
+    )
+    batch = [(thumbnail_bytes, "benchmark{}".format(i)) for i in range(cells)]
+    results.append(
+        measure(
+            "db_save_many_per_grid",
+            lambda: db.save_many(conn, batch),
+            repeat,
+            cells,
+            per_call=cells,
+        )
+    )
+
+    # opening a grid on a machine with an empty texture
+    # cache, decoding every image or fetching the entries
+    # another machine stored in the shared cache
+    images = [
+        file for file in files if file.lower().endswith((".png", ".jpg", ".jpeg"))
+    ]
+    shared = db.SharedCache(conn)
+    hasher = ContentHasher(os.path.join(work_dir, "hashes.sqlite"))
+    machine = {}
+
+    def new_machine(use_shared=True):
+        cache = TextureCache(tempfile.mkdtemp(prefix="textures-", dir=work_dir))
+        if use_shared:
+            cache.shared = shared
+            cache.hasher = hasher
+        machine["cache"] = cache
+
+    def open_grid():
+        cache = machine["cache"]
+        cache.prefetch([(file, 4000) for file in images])
+        for file in images:
+            cache.load(file, 4000)
+
+    new_machine()
+    open_grid()
+    results.append(
+        measure(
+            "texture_decode_open",
+            open_grid,
+            repeat,
+            cells,
+            setup=lambda: new_machine(use_shared=False),
+        )
+    )
+    results.append(
+        measure("shared_cache_open", open_grid, repeat, cells, setup=new_machine)
+    )
+    hasher.close()
+    return results
+
+
+def gui_benchmarks(files, cells, repeat, virtual):
+    # runs in its own process, results are printed as a
+    # json line since kivy logs to the same output
+    os.environ.setdefault("SDL_VIDEODRIVER", "offscreen")
+    os.environ.setdefault("KIVY_NO_ARGS", "1")
+    os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+    from kivy.clock import Clock
+    from grids import grid
+
+    app = grid.GridApp(
+        files=files,
+        use_db=False,
+        unique_session=False,
+        db_host=None,
+        db_port=None,
+        virtual=virtual,
+    )
+    results = []
+
+    def run(dt):
+        try:
+            xml = app.grid_save(wait=True, rewrite=True)
+            results.append(
+                measure(
+                    "grid_save_rewrite",
+                    lambda: app.grid_save(wait=True, rewrite=True),
+                    repeat,
+                    cells,
+                    setup=app.thumbnail_hashes.clear,
+                )
+            )
+
+            def mark_changed():
+                app.thumbnail_changed = True
+
+            results.append(
+                measure(
+                    "grid_save_unchanged_pixels",
+                    lambda: app.grid_save(wait=True),
+                    repeat,
+                    cells,
+                    setup=mark_changed,
+                )
+            )
+
+            def mark_cell():
+                app.grid.cells()[0].dirty = True
+
+            results.append(
+                measure(
+                    "grid_save_journal",
+                    lambda: app.grid_save(wait=True),
+                    repeat,
+                    cells,
+                    setup=mark_cell,
+                )
+            )
+            results.append(
+                measure(
+                    "grid_load",
+                    lambda: app.grid_load(xml),
+                    repeat,
+                    cells,
+                    setup=app.grid.clear_cells,
+                )
+            )
+
+            widget = app.grid.cell_widgets()[0]
+            widget.mouse_above = True
+            presses = 100
+
+            def press():
+                for _ in range(presses):
+                    app._on_keyboard_down(None, (0, "f"), "f", [])
+
+            results.append(
+                measure("key_dispatch", press, repeat, cells, per_call=presses)
+            )
+
+            def press_cold():
+                app.dispatch_targets.clear()
+                app._on_keyboard_down(None, (0, "f"), "f", [])
+
+            results.append(measure("key_dispatch_cold", press_cold, repeat, cells))
+
+        except Exception:
+            traceback.print_exc()
+        finally:
+            print("BENCHMARK {}".format(json.dumps(results)))
+            sys.stdout.flush()
+            app.stop()
+
+    # let the window open and images decode first
+    Clock.schedule_once(run, 2)
+    app.run()
+
+
+def commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "describe", "--always", "--dirty"],
+                cwd=repo_dir,
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark grids")
+    parser.add_argument(
+        "--cells",
+        default="10,100,1000",
+        help="comma separated sizes of the synthetic grids",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="samples per benchmark")
+    parser.add_argument(
+        "--virtual-above",
+        type=int,
+        default=100,
+        help="use a virtual grid for grids with more cells",
+    )
+    parser.add_argument(
+        "--no-gui", action="store_true", help="skip benchmarks that need kivy"
+    )
+    parser.add_argument("--db-host", help="redis host, a stand in by default")
+    parser.add_argument("--db-port", type=int, default=6379, help="redis port")
+    parser.add_argument("-o", "--output", help="write json results to file")
+    parser.add_argument("--gui", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.gui is not None:
+        files = json.loads(sys.stdin.read())
+        return gui_benchmarks(
+            files, args.gui, args.repeat, args.gui > args.virtual_above
+        )
+
+    with tempfile.TemporaryDirectory(prefix="grids-benchmark-") as work_dir:
+        env = dict(os.environ)
+        for variable in ["XDG_DATA_HOME", "XDG_CACHE_HOME", "XDG_CONFIG_HOME"]:
+            env[variable] = os.path.join(work_dir, variable.lower())
+            os.makedirs(env[variable])
+            os.environ[variable] = env[variable]
+        env["PYTHONPATH"] = os.pathsep.join([repo_dir, env.get("PYTHONPATH", "")])
+
+        from fixtures import make_fixtures
+        from standin import RedisStandIn
+
+        standin = None
+        if args.db_host is None:
+            standin = RedisStandIn().start()
+            args.db_host, args.db_port = "127.0.0.1", standin.port
+
+        results = []
+        for cells in [int(size) for size in args.cells.split(",")]:
+            print("{} cells".format(cells), file=sys.stderr)
+            files = make_fixtures(os.path.join(work_dir, "fixtures"), cells)
+            results.extend(
+                headless_benchmarks(
+                    files, cells, args.repeat, work_dir, args.db_host, args.db_port
+                )
+            )
+            if args.no_gui:
+                continue
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    "--gui",
+                    str(cells),
+                    "--repeat",
+                    str(args.repeat),
+                    "--virtual-above",
+                    str(args.virtual_above),
+                ],
+                input=json.dumps(files).encode(),
+                stdout=subprocess.PIPE,
+                env=env,
+            )
+            for line in process.stdout.decode().splitlines():
+                if line.startswith("BENCHMARK "):
+                    results.extend(json.loads(line[len("BENCHMARK ") :]))
+                    break
+            else:
+                print(
+                    "gui benchmarks failed for {} cells".format(cells), file=sys.stderr
+                )
+
+        if standin is not None:
+            standin.stop()
+
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.datetime.now().isoformat(),
+        "db": "stand in" if standin is not None else args.db_host,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
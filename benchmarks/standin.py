@@ -0,0 +1,159 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import socketserver
+import threading
+
+# a minimal redis stand in speaking enough of the redis
+# protocol for db.save, db.save_many and db.SharedCache, so
+# db benchmarks run without a redis server. latency and
+# throughput are not those of redis, use --db-host and
+# --db-port for a real server
+
+
+def bulk(value, proto=2):
+    if value is None:
+        # resp3 has its own null type
+        return b"_\r\n" if proto == 3 else b"$-1\r\n"
+    return b"$" + str(len(value)).encode() + b"\r\n" + value + b"\r\n"
+
+
+def array(values, proto=2):
+    return (
+        b"*"
+        + str(len(values)).encode()
+        + b"\r\n"
+        + b"".join(bulk(value, proto) for value in values)
+    )
+
+
+def integer(value):
+    return ":{}\r\n".format(value).encode()
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+    # protocol version chosen by HELLO
+    proto = 2
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, command, args):
+        store = self.server.store
+        if command == b"PING":
+            return b"+PONG\r\n"
+        elif command == b"HELLO":
+            # server details, a map for resp3 clients
+            proto = int(args[0]) if args else 2
+            self.proto = proto
+            pairs = (
+                b"$6\r\nserver\r\n$5\r\nredis\r\n"
+                b"$5\r\nproto\r\n:" + str(proto).encode() + b"\r\n"
+            )
+            return (b"%2\r\n" if proto == 3 else b"*4\r\n") + pairs
+        elif command == b"SET":
+            store[args[0]] = args[1]
+            return b"+OK\r\n"
+        elif command == b"HSET":
+            fields = store.setdefault(args[0], {})
+            added = 0
+            for field, value in zip(args[1::2], args[2::2]):
+                added += field not in fields
+                fields[field] = value
+            return integer(added)
+        elif command == b"HGET":
+            return bulk(store.get(args[0], {}).get(args[1]), self.proto)
+        elif command == b"HMGET":
+            fields = store.get(args[0], {})
+            return array([fields.get(field) for field in args[1:]], self.proto)
+        elif command == b"HDEL":
+            fields = store.get(args[0], {})
+            return integer(
+                sum(fields.pop(field, None) is not None for field in args[1:])
+            )
+        elif command == b"GET":
+            return bulk(store.get(args[0]), self.proto)
+        elif command == b"MGET":
+            return array([store.get(key) for key in args], self.proto)
+        elif command == b"DEL":
+            return integer(sum(store.pop(key, None) is not None for key in args))
+        elif command in (b"INCRBY", b"DECRBY"):
+            amount = int(args[1]) if command == b"INCRBY" else -int(args[1])
+            value = int(store.get(args[0], 0)) + amount
+            store[args[0]] = str(value).encode()
+            return integer(value)
+        elif command == b"ZADD":
+            # scores by member, options such as NX are not supported
+            members = store.setdefault(args[0], {})
+            added = 0
+            for score, member in zip(args[1::2], args[2::2]):
+                added += member not in members
+                members[member] = float(score)
+            return integer(added)
+        elif command == b"ZRANGE":
+            members = store.get(args[0], {})
+            ordered = sorted(members, key=lambda member: (members[member], member))
+            start, stop = int(args[1]), int(args[2])
+            return array(ordered[start : None if stop == -1 else stop + 1])
+        elif command == b"ZREM":
+            members = store.get(args[0], {})
+            return integer(
+                sum(members.pop(member, None) is not None for member in args[1:])
+            )
+        return b"+OK\r\n"
+
+    def handle(self):
+        queued = None
+        while True:
+            command = self.read_command()
+            if not command:
+                break
+            name, args = command[0].upper(), command[1:]
+            if name == b"MULTI":
+                queued = []
+                self.wfile.write(b"+OK\r\n")
+            elif name == b"EXEC":
+                replies = [self.reply(*queued_command) for queued_command in queued]
+                queued = None
+                self.wfile.write(b"*" + str(len(replies)).encode() + b"\r\n")
+                self.wfile.write(b"".join(replies))
+            elif queued is not None:
+                queued.append((name, args))
+                self.wfile.write(b"+QUEUED\r\n")
+            else:
+                self.wfile.write(self.reply(name, args))
+
+
+class RedisStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.store = {}
+        super(RedisStandIn, self).__init__((host, port), RespHandler)
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
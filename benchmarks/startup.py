@@ -0,0 +1,171 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# startup timings of gg, each sample is a new process
+#
+#     python benchmarks/startup.py -o startup.json
+#     python benchmarks/startup.py --baseline startup.json
+#
+# first_frame is the time from starting the process to the
+# first frame of the window, read from the --stats trace of
+# the process, which is then stopped. with --baseline a
+# median more than --tolerance slower than the baseline is
+# reported and the exit status is 1
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+gg = [sys.executable, "-c", "from grids import cli; cli.main()"]
+
+
+def wall_time(argv, env):
+    # seconds for a process to run to completion
+    start = time.time()
+    subprocess.run(argv, env=env, stdout=subprocess.DEVNULL, check=True)
+    return time.time() - start
+
+
+def first_frame(argv, env, trace_file, timeout=60):
+    # seconds from starting the process to its first frame
+    if os.path.exists(trace_file):
+        os.remove(trace_file)
+    start = time.time()
+    process = subprocess.Popen(
+        argv + ["--stats", trace_file], env=env, stdout=subprocess.DEVNULL
+    )
+    try:
+        while time.time() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("gg exited before the first frame")
+            try:
+                with open(trace_file) as f:
+                    for line in f:
+                        event = json.loads(line)
+                        if event.get("phase") == "first_frame":
+                            return event["time"] - start
+            except (OSError, ValueError):
+                pass
+            time.sleep(0.005)
+        raise RuntimeError("no first frame after {}s".format(timeout))
+    finally:
+        process.kill()
+        process.wait()
+
+
+def summarize(name, times):
+    return {
+        "name": name,
+        "repeat": len(times),
+        "min": min(times),
+        "median": statistics.median(times),
+        "max": max(times),
+    }
+
+
+def regressions(results, baseline, tolerance):
+    previous = {result["name"]: result for result in baseline["results"]}
+    slower = []
+    for result in results:
+        if result["name"] not in previous:
+            continue
+        limit = previous[result["name"]]["median"] * (1 + tolerance)
+        if result["median"] > limit:
+            slower.append(
+                "{} median {:.3f}s, baseline {:.3f}s".format(
+                    result["name"],
+                    result["median"],
+                    previous[result["name"]]["median"],
+                )
+            )
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark gg startup")
+    parser.add_argument(
+        "--cells", type=int, default=100, help="cells of the grid opened"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="samples per benchmark")
+    parser.add_argument("--baseline", help="json results to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="fraction a median may be slower than the baseline",
+    )
+    parser.add_argument("-o", "--output", help="write json results to file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="grids-startup-") as work_dir:
+        env = dict(os.environ)
+        for variable in ["XDG_DATA_HOME", "XDG_CACHE_HOME", "XDG_CONFIG_HOME"]:
+            env[variable] = os.path.join(work_dir, variable.lower())
+            os.makedirs(env[variable])
+        env["PYTHONPATH"] = os.pathsep.join([repo_dir, env.get("PYTHONPATH", "")])
+        env.setdefault("SDL_VIDEODRIVER", "offscreen")
+        env.setdefault("KIVY_NO_CONSOLELOG", "1")
+
+        from fixtures import make_fixtures
+        from run import commit
+
+        files = make_fixtures(os.path.join(work_dir, "fixtures"), args.cells)
+        trace_file = os.path.join(work_dir, "trace.jsonl")
+        # the first run fills the texture cache, later runs
+        # measure a warm start
+        first_frame(gg + files, env, trace_file)
+
+        results = [
+            summarize(
+                "help",
+                [wall_time(gg + ["--help"], env) for _ in range(args.repeat)],
+            ),
+            summarize(
+                "import_grid",
+                [
+                    wall_time([sys.executable, "-c", "import grids.grid"], env)
+                    for _ in range(args.repeat)
+                ],
+            ),
+            summarize(
+                "first_frame_{}".format(args.cells),
+                [first_frame(gg + files, env, trace_file) for _ in range(args.repeat)],
+            ),
+        ]
+
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cells": args.cells,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        for line in slower:
+            print("regression: {}".format(line), file=sys.stderr)
+        if slower:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import collections
+from kivy.clock import Clock
+from kivy.uix.scrollview import ScrollView
+from PIL import Image as PILImage
+
+# gif frames are decoded as they are shown instead of all
+# at once, and every animated cell is advanced from one
+# shared clock event
+
+
+class GifFrames(object):
+    # frames of an animated image decoded on demand, the most
+    # recently decoded frames are kept in a ring of ring_size
+    def __init__(self, source, ring_size=8, min_duration=20):
+        self.img = PILImage.open(source)
+        self.size = self.img.size
+        self.n_frames = getattr(self.img, "n_frames", 1)
+        self.ring_size = ring_size
+        self.ring = collections.OrderedDict()
+        # browsers treat very short frame durations as
+        # unset, which is also what gif authors expect
+        self.min_duration = min_duration
+        self.durations = {}
+
+    def duration(self, index):
+        # milliseconds frame index is shown for, known
+        # once the frame has been decoded
+        duration = self.durations.get(index) or 100
+        if duration < self.min_duration:
+            duration = 100
+        return duration
+
+    def frame(self, index):
+        # rgba pixels of frame index ordered top to bottom
+        if index in self.ring:
+            self.ring.move_to_end(index)
+            return self.ring[index]
+        # seeking forward continues from the current frame,
+        # seeking back decodes again from the first frame
+        self.img.seek(index)
+        self.durations[index] = self.img.info.get("duration")
+        pixels = self.img.convert("RGBA").tobytes()
+        self.ring[index] = pixels
+        while len(self.ring) > self.ring_size:
+            self.ring.popitem(last=False)
+        return pixels
+
+    def close(self):
+        self.ring.clear()
+        self.img.close()
+
+
+class Animator(object):
+    # advances animated cells from one clock event, cells
+    # have an animate(dt) method and are paused while they
+    # are not in the window, scrolled out of view of a
+    # ScrollView they are in, or smaller than min_size
+    def __init__(self, fps=60, min_size=16):
+        self.fps = fps
+        self.min_size = min_size
+        self.cells = []
+        self.event = None
+
+    def add(self, cell):
+        if cell not in self.cells:
+            self.cells.append(cell)
+        if self.event is None:
+            self.event = Clock.schedule_interval(self.tick, 1 / self.fps)
+
+    def remove(self, cell):
+        if cell in self.cells:
+            self.cells.remove(cell)
+        if not self.cells and self.event is not None:
+            self.event.cancel()
+            self.event = None
+
+    def visible(self, cell):
+        if cell.width < self.min_size or cell.height < self.min_size:
+            return False
+        # cells of a tab that is not shown, or of a grid
+        # swapped out, are not in the window
+        window = cell.get_root_window()
+        if window is None:
+            return False
+        x, y = cell.to_window(*cell.pos)
+        right, top = x + cell.width, y + cell.height
+        # cells a VirtualGrid keeps beyond its viewport
+        parent = cell.parent
+        while parent is not None and parent is not window:
+            if isinstance(parent, ScrollView):
+                left, bottom = parent.to_window(*parent.pos)
+                if (
+                    right <= left
+                    or x >= left + parent.width
+                    or top <= bottom
+                    or y >= bottom + parent.height
+                ):
+                    return False
+            parent = parent.parent
+        return right > 0 and top > 0 and x < window.width and y < window.height
+
+    def tick(self, dt):
+        for cell in list(self.cells):
+            if self.visible(cell):
+                try:
+                    cell.animate(dt)
+                except Exception as ex:
+                    print(ex)
+                    self.remove(cell)
@@ -4,6 +4,8 @@
 #
 # Copyright (c) 2018, Galen Curwen-McAdams
 
+import itertools
+
 
 def keybindings():
     actions = {}
@@ -30,5 +32,32 @@ def keybindings():
     actions["grid"]["pan_right"] = [["f"], []]
     actions["grid"]["punch_in"] = [["e"], ["shift"]]
     actions["grid"]["punch_out"] = [["d"], ["shift"]]
+    actions["grid"]["page_up"] = [["pageup"], []]
+    actions["grid"]["page_down"] = [["pagedown"], []]
 
     return actions
+
+
+def compile_bindings(actions):
+    # index of (domain, key, modifiers) to action names
+    #
+    # a key press matches a binding when the pressed modifiers
+    # are a subset of the binding's modifiers, so each nonempty
+    # subset is indexed. bindings without modifiers only match
+    # keys pressed without modifiers
+    index = {}
+    for domain, domain_actions in actions.items():
+        for action, (keys, modifiers) in domain_actions.items():
+            modifiers = set(modifiers)
+            if modifiers:
+                modifier_sets = [
+                    frozenset(subset)
+                    for length in range(1, len(modifiers) + 1)
+                    for subset in itertools.combinations(modifiers, length)
+                ]
+            else:
+                modifier_sets = [frozenset()]
+            for key in keys:
+                for modifier_set in modifier_sets:
+                    index.setdefault((domain, key, modifier_set), []).append(action)
+    return index
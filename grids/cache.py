@@ -0,0 +1,291 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import collections
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from PIL import Image as PILImage
+from grids import stats
+
+# width and height as unsigned ints before the pixels
+header = struct.Struct("<II")
+
+
+class TextureCache(object):
+    # downscaled rgba pixel buffers of image files, stored
+    # as raw files that can be memory mapped and uploaded
+    # as textures without decoding the image again
+    #
+    # entries are keyed on path, size and mtime of the source
+    # so a changed source is decoded again
+    #
+    # with a db.SharedCache as shared, entries missing here
+    # are looked up there by the content hash of the source
+    # before decoding, and decoded entries are stored there
+    def __init__(
+        self,
+        cache_dir,
+        sizes=(512, 2048, 4096),
+        max_bytes=2 * 1024 * 1024 * 1024,
+        max_age=30 * 24 * 60 * 60,
+        touch_interval=60 * 60,
+    ):
+        self.cache_dir = str(cache_dir)
+        self.sizes = sorted(sizes)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # entries are touched at most this often on reads
+        self.touch_interval = touch_interval
+        # bytes of entries, None until the first eviction
+        # has scanned cache_dir
+        self.total = None
+        self.evicting = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.shared = None
+        # a ContentHasher for keys of the shared cache
+        self.hasher = None
+        # events of entries being fetched by prefetch
+        self.prefetching = {}
+        self.lock = threading.Lock()
+
+    def key(self, source):
+        stat = os.stat(source)
+        key = "{}|{}|{}".format(os.path.abspath(source), stat.st_size, stat.st_mtime_ns)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def level(self, size):
+        # smallest stored size that covers size
+        for level in self.sizes:
+            if level >= size:
+                return level
+        return self.sizes[-1]
+
+    def entry_file(self, key, level):
+        return os.path.join(self.cache_dir, "{}-{}.rgba".format(key, level))
+
+    def get(self, source, size):
+        # returns (width, height, pixels) or None
+        try:
+            entry = self.entry_file(self.key(source), self.level(size))
+            with open(entry, "rb") as f:
+                # copy on write since texture uploads
+                # expect a writable buffer
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+                modified = os.fstat(f.fileno()).st_mtime
+            width, height = header.unpack_from(mapped)
+            # touch for age based eviction, not on every read
+            # since that makes each hit a metadata write
+            if time.time() - modified > self.touch_interval:
+                os.utime(entry)
+            return width, height, memoryview(mapped)[header.size :]
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def decode(self, source, size):
+        # decode source downscaled to the cache level for
+        # size, store it and return (width, height, pixels)
+        with stats.timer("image_decode"):
+            return self.decode_entry(source, size)
+
+    def decode_entry(self, source, size):
+        level = self.level(size)
+        key = self.key(source)
+        img = PILImage.open(source)
+        # let jpeg decode at a reduced scale
+        img.draft("RGB", (level, level))
+        if max(img.size) > level:
+            img.thumbnail((level, level), PILImage.BILINEAR)
+        img = img.convert("RGBA")
+        width, height = img.size
+        pixels = img.tobytes()
+        img.close()
+
+        self.write_entry(
+            self.entry_file(key, level), header.pack(width, height), pixels
+        )
+        return width, height, pixels
+
+    def write_entry(self, entry, *contents):
+        tmp_entry = "{}.{}.{}.tmp".format(entry, os.getpid(), threading.get_ident())
+        try:
+            with open(tmp_entry, "wb") as f:
+                for content in contents:
+                    f.write(content)
+            os.replace(tmp_entry, entry)
+        except OSError as ex:
+            print(ex)
+            return
+        # keep the cache under max_bytes while it is used,
+        # not only at startup
+        with self.lock:
+            if self.total is not None:
+                self.total += sum(len(content) for content in contents)
+            over = self.total is None or self.total > self.max_bytes
+        if over:
+            self.evict()
+
+    def load(self, source, size):
+        cached = self.get(source, size)
+        if cached is None and self.shared is not None:
+            # wait for a prefetch of the entry to finish
+            with self.lock:
+                fetched = self.prefetching.get(
+                    self.entry_file(self.key(source), self.level(size))
+                )
+            if fetched is not None:
+                fetched.wait(10)
+                cached = self.get(source, size)
+        if cached is None:
+            stats.count("texture_cache_miss")
+            cached = self.decode(source, size)
+            if self.shared is not None:
+                self.share(source, size, cached)
+        else:
+            stats.count("texture_cache_hit")
+        return cached
+
+    def shared_key(self, source, size):
+        return self.shared.texture_key(self.hasher.hash(source), self.level(size))
+
+    def share(self, source, size, cached):
+        width, height, pixels = cached
+        try:
+            contents = zlib.compress(header.pack(width, height) + bytes(pixels), 1)
+            self.shared.put(self.shared_key(source, size), contents)
+        except Exception as ex:
+            print(ex)
+
+    def prefetch(self, sources):
+        # fetch entries of (source, size) pairs missing here
+        # from the shared cache in batches on a thread, loads
+        # of the entries wait for their batch
+        if self.shared is None or not self.shared.available:
+            return
+        missing = []
+        with self.lock:
+            for source, size in sources:
+                try:
+                    entry = self.entry_file(self.key(source), self.level(size))
+                except OSError:
+                    continue
+                if entry in self.prefetching or os.path.exists(entry):
+                    continue
+                self.prefetching[entry] = threading.Event()
+                missing.append((source, size, entry))
+        if missing:
+            threading.Thread(
+                target=self.fetch_entries, args=(missing,), daemon=True
+            ).start()
+
+    def fetch_entries(self, missing):
+        for start in range(0, len(missing), self.shared.batch_size):
+            batch = missing[start : start + self.shared.batch_size]
+            try:
+                keys = [self.shared_key(source, size) for source, size, _ in batch]
+                for (_, _, entry), contents in zip(batch, self.shared.get_many(keys)):
+                    if contents is not None:
+                        self.write_entry(entry, zlib.decompress(contents))
+            except Exception as ex:
+                print(ex)
+            finally:
+                with self.lock:
+                    for _, _, entry in batch:
+                        self.prefetching.pop(entry).set()
+
+    def evict(self):
+        # remove entries older than max_age, then the least
+        # recently used entries until a tenth under max_bytes
+        # so every write does not evict again. skipped while
+        # another thread is evicting
+        if not self.evicting.acquire(blocking=False):
+            return
+        try:
+            self.evict_entries()
+        finally:
+            self.evicting.release()
+
+    def evict_entries(self):
+        entries = []
+        now = time.time()
+        for entry in os.scandir(self.cache_dir):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age:
+                self.remove(entry.path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * 0.9:
+                break
+            self.remove(path)
+            total -= size
+        with self.lock:
+            self.total = total
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class LRUCache(object):
+    # least recently used values kept up to max_bytes and
+    # max_entries, evicted values are passed to on_evict
+    def __init__(self, max_bytes, max_entries=16, on_evict=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self.entries = collections.OrderedDict()
+        self.total = 0
+
+    def put(self, key, value, cost):
+        if key in self.entries:
+            self.evict(key)
+        self.entries[key] = (value, cost)
+        self.total += cost
+        while self.entries and (
+            self.total > self.max_bytes or len(self.entries) > self.max_entries
+        ):
+            self.evict(next(iter(self.entries)))
+
+    def get(self, key):
+        # value for key or None, marked as recently used
+        try:
+            self.entries.move_to_end(key)
+        except KeyError:
+            return None
+        return self.entries[key][0]
+
+    def take(self, key):
+        # remove and return the value for key or None
+        try:
+            value, cost = self.entries.pop(key)
+        except KeyError:
+            return None
+        self.total -= cost
+        return value
+
+    def evict(self, key):
+        value = self.take(key)
+        if self.on_evict is not None:
+            try:
+                self.on_evict(value)
+            except Exception as ex:
+                print(ex)
+
+    def clear(self):
+        for key in list(self.entries):
+            self.evict(key)
@@ -0,0 +1,264 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import argparse
+import datetime
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from xdg import XDG_CACHE_HOME, XDG_DATA_HOME
+from grids import state
+
+# sqlite index of the grids in the data directory, updated
+# as grids are saved so finding the grids that contain a
+# file or link to a grid does not parse every xml
+#
+# grids are identified by their grid hash, the name of
+# their xml without the extension
+
+schema = """
+create table if not exists grids (
+    hash text primary key,
+    file text not null,
+    thumbnail text,
+    cells integer not null,
+    created real not null,
+    modified real not null,
+    mtime_ns integer
+);
+create index if not exists grids_modified on grids (modified);
+create table if not exists members (
+    grid text not null,
+    position integer not null,
+    source text not null,
+    primary key (grid, position)
+) without rowid;
+create index if not exists members_source on members (source);
+create table if not exists links (
+    grid text not null,
+    child text not null,
+    primary key (grid, child)
+) without rowid;
+create index if not exists links_child on links (child);
+"""
+
+
+def grid_hash(file):
+    return os.path.splitext(os.path.basename(file))[0]
+
+
+class Catalog(object):
+    # connections are shared between threads, the save
+    # worker updates the catalog while the app reads it
+    def __init__(self, path):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        # readers such as gg catalog do not block saves
+        self.conn.execute("pragma journal_mode=wal")
+        self.conn.execute("pragma synchronous=normal")
+        self.conn.executescript(schema)
+
+    def update(self, file, thumbnail, cells, modified=None):
+        # replace the members and links of a grid, cells are
+        # dicts of attributes with source and position
+        if modified is None:
+            modified = time.time()
+        try:
+            mtime_ns = os.stat(file).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        file_hash = grid_hash(file)
+        members = []
+        links = set()
+        for cell in cells:
+            source = cell["source"]
+            members.append((file_hash, int(cell["position"]), source))
+            if source.endswith(".xml"):
+                links.add((file_hash, grid_hash(source)))
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "insert into grids values (?, ?, ?, ?, ?, ?, ?) "
+                "on conflict (hash) do update set file = excluded.file, "
+                "thumbnail = excluded.thumbnail, cells = excluded.cells, "
+                "modified = excluded.modified, mtime_ns = excluded.mtime_ns",
+                (
+                    file_hash,
+                    file,
+                    thumbnail,
+                    len(members),
+                    modified,
+                    modified,
+                    mtime_ns,
+                ),
+            )
+            self.conn.execute("delete from members where grid = ?", (file_hash,))
+            self.conn.execute("delete from links where grid = ?", (file_hash,))
+            self.conn.executemany("insert into members values (?, ?, ?)", members)
+            self.conn.executemany("insert into links values (?, ?)", links)
+
+    def touch(self, file, modified=None):
+        # a grid saved without changing its cells
+        if modified is None:
+            modified = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "update grids set modified = ? where hash = ?",
+                (modified, grid_hash(file)),
+            )
+
+    def remove(self, file):
+        file_hash = grid_hash(file)
+        with self.lock, self.conn:
+            for table, column in [("grids", "hash"), ("members", "grid")]:
+                self.conn.execute(
+                    "delete from {} where {} = ?".format(table, column), (file_hash,)
+                )
+            self.conn.execute("delete from links where grid = ?", (file_hash,))
+
+    def query(self, sql, parameters=()):
+        with self.lock:
+            return self.conn.execute(sql, parameters).fetchall()
+
+    def grids(self, where="", parameters=(), limit=None):
+        # rows of (file, cells, modified), most recent first
+        sql = (
+            "select file, cells, modified from grids {} order by modified desc".format(
+                where
+            )
+        )
+        if limit is not None:
+            sql += " limit {:d}".format(limit)
+        return self.query(sql, parameters)
+
+    def recent(self, limit=None):
+        return self.grids(limit=limit)
+
+    def containing(self, source, limit=None):
+        # grids with a cell for source
+        return self.grids(
+            "where hash in (select grid from members where source = ?)",
+            (os.path.abspath(source),),
+            limit,
+        )
+
+    def linking_to(self, file, limit=None):
+        # grids with a nested cell for the grid file
+        return self.grids(
+            "where hash in (select grid from links where child = ?)",
+            (grid_hash(file),),
+            limit,
+        )
+
+    def children(self, file, limit=None):
+        # grids nested in the grid file
+        return self.grids(
+            "where hash in (select child from links where grid = ?)",
+            (grid_hash(file),),
+            limit,
+        )
+
+    def sync(self, data_dir):
+        # index grids in data_dir changed since they were
+        # indexed and drop grids that no longer exist,
+        # returns the number of grids indexed
+        indexed = dict(self.query("select hash, mtime_ns from grids"))
+        seen = set()
+        count = 0
+        for entry in os.scandir(str(data_dir)):
+            if not entry.name.endswith(".xml") or not entry.is_file():
+                continue
+            file_hash = grid_hash(entry.path)
+            seen.add(file_hash)
+            stat = entry.stat()
+            journal = state.journal_file(entry.path)
+            if indexed.get(file_hash) == stat.st_mtime_ns and not os.path.isfile(
+                journal
+            ):
+                continue
+            try:
+                header = state.read_header(entry.path)
+                cells = state.load_cells(entry.path)
+            except Exception as ex:
+                print("{}: {}".format(entry.path, ex))
+                continue
+            self.update(entry.path, header["thumbnail"], cells, stat.st_mtime)
+            count += 1
+        for file_hash in set(indexed) - seen:
+            self.remove(file_hash)
+        return count
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="gg catalog", description="find grids in the data directory"
+    )
+    query = parser.add_mutually_exclusive_group()
+    query.add_argument("--containing", help="grids with a cell for file")
+    query.add_argument("--links-to", help="grids with grid xml nested in them")
+    query.add_argument("--children", help="grids nested in grid xml")
+    query.add_argument(
+        "--recent", action="store_true", help="grids by when they were saved"
+    )
+    parser.add_argument("-n", "--limit", type=int, help="number of grids to list")
+    parser.add_argument(
+        "--open", action="store_true", help="open the most recent grid found"
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="index grids changed outside of gg before querying",
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=str(pathlib.PurePath(XDG_DATA_HOME, "grids")),
+        help="directory of grid xml and png files",
+    )
+    args = parser.parse_args(argv)
+
+    cache_dir = pathlib.PurePath(XDG_CACHE_HOME, "grids")
+    os.makedirs(str(cache_dir), exist_ok=True)
+    catalog = Catalog(pathlib.PurePath(cache_dir, "catalog.sqlite"))
+    if args.sync:
+        start = time.perf_counter()
+        count = catalog.sync(args.data_dir)
+        print("{} grids indexed in {:.2f}s".format(count, time.perf_counter() - start))
+
+    limit = 1 if args.open else args.limit
+    if args.containing:
+        rows = catalog.containing(args.containing, limit)
+    elif args.links_to:
+        rows = catalog.linking_to(args.links_to, limit)
+    elif args.children:
+        rows = catalog.children(args.children, limit)
+    elif args.recent or not args.sync:
+        rows = catalog.recent(limit)
+    else:
+        rows = []
+    catalog.close()
+
+    if args.open:
+        if rows:
+            from grids import grid
+
+            grid.main([rows[0][0]])
+        return
+
+    for file, cells, modified in rows:
+        print(
+            "{}  {:>5} cells  {}".format(
+                datetime.datetime.fromtimestamp(modified).strftime("%Y-%m-%d %H:%M"),
+                cells,
+                file,
+            )
+        )
@@ -0,0 +1,123 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import argparse
+import os
+import sys
+
+
+def grid_parser():
+    # arguments of the grid window, parsed before kivy is
+    # imported so --help and usage errors do not open one
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+")
+    parser.add_argument(
+        "--use-db", action="store_true", help="save grids to db in a machinic format"
+    )
+    parser.add_argument(
+        "--unique-session",
+        action="store_true",
+        help="assign db grids a unique uuid instead of grid hash",
+    )
+    parser.add_argument(
+        "--virtual",
+        action="store_true",
+        help="only create widgets for visible cells, for grids with many files",
+    )
+    parser.add_argument("--db-host", default="127.0.0.1", help="db host ip")
+    parser.add_argument("--db-port", default="6379", type=int, help="db port")
+    parser.add_argument(
+        "--grid-cache-size",
+        default=512,
+        type=int,
+        help="megabytes of textures kept for recently visited grids",
+    )
+    parser.add_argument(
+        "--deep-zoom",
+        action="store_true",
+        help="show large images from tile pyramids, loading only tiles in view",
+    )
+    parser.add_argument(
+        "--tile-cache-size",
+        default=256,
+        type=int,
+        help="megabytes of deep zoom tiles kept as textures",
+    )
+    parser.add_argument(
+        "--shared-cache",
+        action="store_true",
+        help="share decoded textures and representations with other machines "
+        "through the db at --db-host and --db-port",
+    )
+    parser.add_argument(
+        "--shared-cache-size",
+        default=1024,
+        type=int,
+        help="megabytes of the shared cache before least recently used "
+        "entries are removed",
+    )
+    parser.add_argument(
+        "--watch",
+        default="inotify",
+        choices=["inotify", "poll", "off"],
+        help="reload cells whose files change on disk, inotify falls back to poll",
+    )
+    parser.add_argument(
+        "--thumbnail-size",
+        type=int,
+        help="largest side of saved grid thumbnails, full size if not set",
+    )
+    parser.add_argument(
+        "--thumbnail-compression",
+        default=6,
+        type=int,
+        choices=range(10),
+        help="png compression level of thumbnails, 0 is fastest",
+    )
+    parser.add_argument(
+        "--thumbnail-format",
+        default="png",
+        choices=["png", "jpeg", "webp"],
+        help="format of thumbnails saved to db",
+    )
+    parser.add_argument(
+        "--thumbnail-quality",
+        default=90,
+        type=int,
+        help="quality of jpeg and webp thumbnails saved to db",
+    )
+    parser.add_argument(
+        "--stats",
+        metavar="FILE",
+        help="record timings to a json lines file, summarized on exit",
+    )
+
+    return parser
+
+
+def main():
+    # subcommands that do not need a window are dispatched
+    # before kivy is imported, since importing kivy opens one
+    argv = sys.argv[1:]
+    if argv and argv[0] == "render":
+        from grids import render
+
+        return render.main(argv[1:])
+    elif argv and argv[0] == "maintain":
+        from grids import maintain
+
+        return maintain.main(argv[1:])
+    elif argv and argv[0] == "catalog":
+        from grids import catalog
+
+        return catalog.main(argv[1:])
+
+    grid_parser().parse_args(argv)
+    # arguments are gg's, not kivy's
+    os.environ.setdefault("KIVY_NO_ARGS", "1")
+    from grids import grid
+
+    grid.main(argv)
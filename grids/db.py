@@ -0,0 +1,199 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import datetime
+import threading
+import time
+import redis
+from grids import stats
+
+# grid thumbnails are stored in a machinic format, the png
+# bytes under binary:<uuid> and a glworb hash describing
+# them under glworb:<uuid>
+binary_blob_prefix = "binary:"
+
+# one connection pool per db, shared by every client
+# so saves reuse open connections
+connection_pools = {}
+connection_pools_lock = threading.Lock()
+
+
+def connection_pool(host, port, **kwargs):
+    pool_key = (host, port) + tuple(sorted(kwargs.items()))
+    with connection_pools_lock:
+        if pool_key not in connection_pools:
+            connection_pools[pool_key] = redis.ConnectionPool(
+                host=host, port=port, **kwargs
+            )
+        return connection_pools[pool_key]
+
+
+def connect(host, port, **kwargs):
+    # responses are not decoded, blobs are binary
+    # and glworbs are only written
+    return redis.StrictRedis(connection_pool=connection_pool(host, port, **kwargs))
+
+
+def glworb(grid_hash, session_uuid=None):
+    # returns (blob key, glworb key, glworb)
+    # use glworb:grid_hash by default
+    # use binary:grid_hash by default to overwrite
+    if session_uuid is None:
+        uuid = grid_hash
+    else:
+        uuid = session_uuid
+
+    glworb = {}
+    glworb["uuid"] = uuid
+    glworb["binary_key"] = binary_blob_prefix + uuid
+    glworb["created"] = str(datetime.datetime.now())
+    glworb["slurp_method"] = "grids"  # self.slurp_method
+    # try:
+    #     glworb['slurp_source_uid'] = device['uid']
+    #     glworb['slurp_source_name'] =  device['name']
+    # except:
+    #     pass
+    # for k, v in metadata.items():
+    #     glworb[k] = v
+    return glworb["binary_key"], "glworb:{}".format(uuid), glworb
+
+
+def save(conn, thumbnail_bytes, grid_hash, session_uuid=None):
+    return save_many(conn, [(thumbnail_bytes, grid_hash)], session_uuid)
+
+
+def save_many(conn, grids, session_uuid=None):
+    # grids is a list of (thumbnail bytes, grid hash), every
+    # blob and glworb is written in one round trip in a
+    # transaction so a glworb never points at a missing blob
+    slurped = []
+    pipe = conn.pipeline(transaction=True)
+    for thumbnail_bytes, grid_hash in grids:
+        blob_uuid, glworb_uuid, fields = glworb(grid_hash, session_uuid)
+        pipe.set(blob_uuid, thumbnail_bytes)
+        pipe.hset(glworb_uuid, mapping=fields)
+        slurped.append(glworb_uuid)
+    pipe.execute()
+    return slurped
+
+
+class SharedCache(object):
+    # cache entries shared between machines using the same
+    # db, such as downscaled textures and representations of
+    # nested grids. keys are built from content hashes, so
+    # the same file at different paths shares one entry
+    #
+    # the last use of each key is kept in a sorted set and
+    # its size in a hash, once the recorded total is over
+    # max_bytes the least recently used entries are removed.
+    # the client that removes the size of an entry accounts
+    # for it, so clients evicting at once do not count an
+    # entry twice
+    #
+    # the cache is optional, after a db error it is skipped
+    # for retry_interval seconds instead of stalling loads
+    prefix = "grids:cache:"
+
+    def __init__(
+        self,
+        conn,
+        max_bytes=1024 * 1024 * 1024,
+        max_entry_bytes=32 * 1024 * 1024,
+        batch_size=64,
+        retry_interval=30,
+    ):
+        self.conn = conn
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self.used_key = self.prefix + "used"
+        self.sizes_key = self.prefix + "sizes"
+        self.total_key = self.prefix + "bytes"
+        self.unavailable_until = 0
+
+    def texture_key(self, filehash, level):
+        return "{}texture:{}:{}".format(self.prefix, filehash, level)
+
+    def representation_key(self, key):
+        return "{}representation:{}".format(self.prefix, key)
+
+    @property
+    def available(self):
+        return time.monotonic() >= self.unavailable_until
+
+    def failed(self, ex):
+        print("shared cache unavailable: {}".format(ex))
+        self.unavailable_until = time.monotonic() + self.retry_interval
+
+    def get_many(self, keys):
+        # values of keys, None where missing, with one MGET
+        # for each batch_size keys
+        if not keys or not self.available:
+            return [None] * len(keys)
+        values = []
+        try:
+            with stats.timer("shared_cache_get"):
+                for start in range(0, len(keys), self.batch_size):
+                    values.extend(self.conn.mget(keys[start : start + self.batch_size]))
+                hits = [key for key, value in zip(keys, values) if value is not None]
+                if hits:
+                    now = time.time()
+                    self.conn.zadd(self.used_key, {key: now for key in hits})
+        except redis.RedisError as ex:
+            self.failed(ex)
+            return [None] * len(keys)
+        stats.count("shared_cache_hit", len(hits))
+        stats.count("shared_cache_miss", len(keys) - len(hits))
+        return values
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def put(self, key, value):
+        if len(value) > self.max_entry_bytes or not self.available:
+            return
+        try:
+            with stats.timer("shared_cache_put"):
+                pipe = self.conn.pipeline(transaction=False)
+                pipe.hget(self.sizes_key, key)
+                pipe.set(key, value)
+                pipe.zadd(self.used_key, {key: time.time()})
+                pipe.hset(self.sizes_key, key, len(value))
+                previous = pipe.execute()[0]
+                total = self.conn.incrby(
+                    self.total_key, len(value) - int(previous or 0)
+                )
+                if total > self.max_bytes:
+                    self.evict(total)
+        except redis.RedisError as ex:
+            self.failed(ex)
+
+    def evict(self, total):
+        # remove least recently used entries until the
+        # recorded total is under max_bytes
+        while total > self.max_bytes:
+            keys = self.conn.zrange(self.used_key, 0, self.batch_size - 1)
+            if not keys:
+                # sizes of entries removed by hand
+                self.conn.set(self.total_key, 0)
+                return
+            sizes = self.conn.hmget(self.sizes_key, keys)
+            # only as many entries as needed
+            excess = total - self.max_bytes
+            count = 0
+            while count < len(keys) and excess > 0:
+                excess -= int(sizes[count] or 0)
+                count += 1
+            keys, sizes = keys[:count], sizes[:count]
+            pipe = self.conn.pipeline(transaction=False)
+            for key in keys:
+                pipe.delete(key)
+                pipe.hdel(self.sizes_key, key)
+            pipe.zrem(self.used_key, *keys)
+            removed = pipe.execute()[1:-1:2]
+            freed = sum(int(size or 0) for size, hdel in zip(sizes, removed) if hdel)
+            total = self.conn.decrby(self.total_key, freed)
@@ -0,0 +1,51 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DecodePool(object):
+    # decodes images through the texture cache on a pool of
+    # threads, pil releases the gil while decoding
+    #
+    # finished decodes are queued and their callbacks are
+    # called from finish(), which the main thread calls
+    # every frame so textures are only created there
+    def __init__(self, cache, workers=None):
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+        self.finished = queue.Queue()
+
+    def request(self, source, size, callback):
+        # callback is called with the future on the main thread
+        return self.submit(callback, self.cache.load, source, size)
+
+    def submit(self, callback, function, *args):
+        # run function on the pool, callback is called
+        # with the future on the main thread
+        future = self.executor.submit(function, *args)
+        future.add_done_callback(lambda f: self.finished.put((callback, f)))
+        return future
+
+    def finish(self, budget=0.008):
+        # run finished callbacks for up to budget seconds
+        # so a burst of decodes does not stall a frame
+        start = time.perf_counter()
+        while time.perf_counter() - start < budget:
+            try:
+                callback, future = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(future)
+            except Exception as ex:
+                print(ex)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -13,24 +13,38 @@ from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.image import Image
 from kivy.core.image import Image as CoreImage
 from kivy.graphics.vertex_instructions import Line
-from kivy.graphics import Color, Rectangle
+from kivy.graphics import Color, PopMatrix, PushMatrix, Rectangle, Scale
+from kivy.graphics.texture import Texture
 from kivy.uix.label import Label
+from kivy.uix.widget import Widget
+from kivy.core.text import Label as CoreLabel
+from kivy.metrics import sp
 from kivy.uix.textinput import TextInput
 from kivy.uix.scrollview import ScrollView
 from kivy.clock import Clock
-from PIL import Image as PILImage, ImageDraw, ImageColor
 from grids import bindings
-import argparse
+from grids import cli, state, stats
+from grids.worker import SaveWorker, merge_snapshots
+from grids.animation import Animator, GifFrames
+from grids.cache import LRUCache, TextureCache
+from grids.catalog import Catalog
+from grids.hashing import ContentHasher
+from grids.decode import DecodePool
+from grids.text import TextSource
+from grids.tiles import TileStore, tile_rect, visible_tiles
+from grids.watch import FileWatcher
 import os
 import io
 import math
 import hashlib
-import datetime
 import pathlib
 import uuid
-import redis
+import threading
+import time
 from xdg import XDG_CACHE_HOME, XDG_CONFIG_HOME, XDG_DATA_HOME
-from lxml import etree
+
+# sources shown as images, anything else is shown as text
+image_extensions = (".png", ".jpg", ".jpeg", ".gif", ".tif", ".tiff")
 
 
 class BindingsContainer(BoxLayout):
@@ -82,6 +96,9 @@ class BindingItem(BoxLayout):
         self.keys = self.parse_input(self.keys_input.text)
         self.modifiers = self.parse_input(self.modifiers_input.text)
         self.actions[self.domain][self.action] = [self.keys, self.modifiers]
+        app = App.get_running_app()
+        if app is not None:
+            app.bindings_changed()
 
     def parse_input(self, text):
         text = text.strip()
@@ -98,6 +115,68 @@ class TabItem(TabbedPanelItem):
         super(TabItem, self).__init__(**kwargs)
 
 
+class StatsView(BoxLayout):
+    # a row for each recorded phase with its timings and
+    # a histogram, see stats.Phase.histogram
+    def __init__(self, **kwargs):
+        super(StatsView, self).__init__(
+            orientation="vertical", size_hint_y=None, **kwargs
+        )
+        self.rows = {}
+        self.add_widget(Label(text="histograms from 10us to 10s, log scale", height=40))
+        self.height = 40
+
+    def refresh(self):
+        for name, summary, histogram in stats.snapshot():
+            row = self.rows.get(name)
+            if row is None:
+                row = StatsRow(size_hint_y=None, height=60)
+                self.rows[name] = row
+                self.add_widget(row)
+                self.height += row.height
+            row.update(name, summary, histogram)
+
+
+class StatsRow(BoxLayout):
+    def __init__(self, **kwargs):
+        super(StatsRow, self).__init__(**kwargs)
+        self.counts = []
+        self.label = Label(size_hint_x=0.5, halign="left", valign="middle")
+        self.label.bind(size=self.label.setter("text_size"))
+        self.histogram = Widget()
+        self.histogram.bind(pos=self.draw, size=self.draw)
+        self.add_widget(self.label)
+        self.add_widget(self.histogram)
+
+    def update(self, name, summary, histogram):
+        self.label.text = "{}  n {}\np50 {:.2f}  p95 {:.2f}  max {:.2f} ms".format(
+            name,
+            summary["count"],
+            summary["p50"] * 1000,
+            summary["p95"] * 1000,
+            summary["max"] * 1000,
+        )
+        self.counts = histogram
+        self.draw()
+
+    def draw(self, *args):
+        self.histogram.canvas.clear()
+        if not self.counts:
+            return
+        peak = max(self.counts) or 1
+        bar_width = self.histogram.width / len(self.counts)
+        with self.histogram.canvas:
+            Color(1, 1, 1, 0.5)
+            for i, samples in enumerate(self.counts):
+                Rectangle(
+                    pos=(self.histogram.x + i * bar_width, self.histogram.y + 5),
+                    size=(
+                        max(1, bar_width - 2),
+                        (self.histogram.height - 10) * samples / peak,
+                    ),
+                )
+
+
 class BgLabel(Label):
     # label with custom background color
     def __init__(self, **kwargs):
@@ -113,9 +192,31 @@ class BgLabel(Label):
             pass
 
 
+class TextBlock(Widget):
+    # a block of lines of a TxtPixel, drawn from a texture
+    # rendered by TxtPixel.block_texture
+    def __init__(self, **kwargs):
+        super(TextBlock, self).__init__(**kwargs)
+        with self.canvas:
+            Color(.15, .15, .15, 1)
+            self.background = Rectangle(pos=self.pos, size=self.size)
+            Color(1, 1, 1, 1)
+            self.text = Rectangle(pos=self.pos, size=self.size)
+        self.bind(pos=self.update, size=self.update)
+
+    def show(self, texture):
+        self.text.texture = texture
+        self.size = texture.size
+
+    def update(self, *args):
+        self.background.pos = self.text.pos = self.pos
+        self.background.size = self.text.size = self.size
+
+
 class BgGridLayout(GridLayout):
     # grid layout with custom background color
     def __init__(self, **kwargs):
+        self.records = []
         super(BgGridLayout, self).__init__(**kwargs)
 
     def on_size(self, *args):
@@ -127,10 +228,296 @@ class BgGridLayout(GridLayout):
         except AttributeError:
             pass
 
+    def layout_cells(self, count):
+        # if only two items, grid will split
+        # with rows or columns first
+        self.rows = math.ceil(count / 2)
+        self.cols = math.ceil(count / 2)
+        if count == 2:
+            self.cols += 1
+
+    def add_cell(self, record):
+        self.records.append(record)
+        self.add_widget(record.show())
+
+    def replace_cell(self, record):
+        # create the widget of a shown record again in place
+        widget = record.widget
+        index = self.children.index(widget)
+        self.remove_widget(widget)
+        record.hide()
+        self.add_widget(record.show(), index=index)
+
+    def cells(self):
+        # cells in the order grid_save stores them
+        return self.children
+
+    def cell_widgets(self):
+        return self.children
+
+    def clear_cells(self):
+        for child in self.children:
+            child.release()
+        self.clear_widgets()
+        self.records = []
+
+    def detach_cells(self):
+        # remove the cells but keep their widgets, records
+        # are returned in the order they were added
+        records = self.records
+        for child in self.children:
+            child.release()
+        self.clear_widgets()
+        self.records = []
+        return records
+
+    def cell_at(self, pos):
+        # cell widget under a window position, found from
+        # the row and column since cells are equally sized
+        if self.parent is not None:
+            pos = self.parent.to_widget(*pos)
+        if not self.children or not self.collide_point(*pos):
+            return None
+        # GridLayout only lays out the rows its children fill,
+        # which can be fewer than the rows set by layout_cells
+        cols = self.cols or 1
+        rows = math.ceil(len(self.children) / cols)
+        col = min(cols - 1, int((pos[0] - self.x) * cols // self.width))
+        row = min(rows - 1, int((self.top - pos[1]) * rows // self.height))
+        index = row * cols + col
+        if index >= len(self.children):
+            return None
+        # children are laid out from the last added
+        return self.children[-1 - index]
+
+
+class CellRecord(object):
+    # lightweight state for a cell, a widget is only
+    # created from it while the cell is shown
+    def __init__(self, cell_class, **kwargs):
+        self.cell_class = cell_class
+        self.kwargs = kwargs
+        self.widget = None
+        self._dirty = True
+        # when the widget was created
+        self.loaded = 0
+
+    @property
+    def dirty(self):
+        if self.widget is not None and self.widget.dirty:
+            return True
+        return self._dirty
+
+    @dirty.setter
+    def dirty(self, value):
+        self._dirty = value
+        if self.widget is not None:
+            self.widget.dirty = value
+
+    def show(self):
+        if self.widget is None:
+            if self.kwargs.get("source") is None:
+                self.resolve_link()
+            self.widget = self.cell_class(**self.kwargs)
+            self.widget.dirty = self._dirty
+            self.loaded = time.time_ns()
+        return self.widget
+
+    def resolve_link(self):
+        # nested grids look up their thumbnail when first
+        # shown instead of when the grid is loaded
+        link_to = self.kwargs["link_to"]
+        source, source_type = self.kwargs["app"].nested_thumbnail(link_to)
+        if source is None:
+            self.cell_class = TxtPixel
+            self.kwargs = {
+                "source": link_to,
+                "source_type": "file",
+                "scroll_x": self.kwargs.get("scroll_x", 0),
+                "scroll_y": self.kwargs.get("scroll_y", 1),
+                "app": self.kwargs["app"],
+            }
+        else:
+            self.kwargs["source"] = source
+            self.kwargs["source_type"] = source_type
+
+    def hide(self):
+        # keep the widget state so it can be recreated
+        if self.widget is not None:
+            for attribute, value in self.widget.state().items():
+                if attribute in state.journaled_attributes:
+                    self.kwargs[attribute] = value
+            self._dirty = self.dirty
+            self.widget.release()
+            self.widget = None
+
+    def texture_bytes(self):
+        # memory held by the textures of the cell widget
+        if self.widget is None:
+            return 0
+        # tiles of a TileLayer are counted in app.tile_textures
+        total = 0
+        for widget in self.widget.walk(restrict=True):
+            texture = getattr(widget, "texture", None)
+            if isinstance(texture, Texture):
+                total += texture.width * texture.height * 4
+        return total
+
+    def state(self):
+        if self.widget is not None:
+            return self.widget.state()
+        # same attributes as the cell widget state()
+        attributes = {}
+        attributes["source"] = self.kwargs["source"]
+        attributes["source_type"] = self.kwargs["source_type"]
+        if self.kwargs.get("link_to"):
+            attributes["source"] = self.kwargs["link_to"]
+            attributes["source_type"] = "file"
+        attributes["scroll_x"] = str(float(self.kwargs.get("scroll_x", 0)))
+        attributes["scroll_y"] = str(float(self.kwargs.get("scroll_y", 1)))
+        if self.cell_class is ImgPixel:
+            attributes["zoom"] = str(float(self.kwargs.get("zoom", 1)))
+        elif self.kwargs.get("font_size") is not None:
+            attributes["font_size"] = str(float(self.kwargs["font_size"]))
+        return attributes
+
+
+class VirtualGrid(ScrollView):
+    # grid that keeps a CellRecord for every cell and only
+    # creates widgets for cells in or near the viewport,
+    # cells are cell_size high and scroll vertically
+    def __init__(self, cell_size=400, overscan=1, **kwargs):
+        self.records = []
+        self.shown = {}
+        self.cell_size = cell_size
+        # rows of cells kept beyond the viewport
+        self.overscan = overscan
+        self.cols = 1
+        super(VirtualGrid, self).__init__(do_scroll_x=False, bar_width=20, **kwargs)
+        self.layout = FloatLayout(size_hint_y=None)
+        self.add_widget(self.layout)
+        # canvas.before holds the scrollview stencil
+        # instructions so it is added to and not cleared
+        with self.canvas.before:
+            Color(.15, .15, .15, 1)
+            self.background = Rectangle(pos=self.pos, size=self.size)
+        self.bind(size=self.layout_records, scroll_y=self.update_shown)
+
+    def on_size(self, *args):
+        self.background.pos = self.pos
+        self.background.size = self.size
+
+    def on_pos(self, *args):
+        self.background.pos = self.pos
+
+    def layout_cells(self, count):
+        # columns depend on width, see layout_records
+        pass
+
+    def add_cell(self, record):
+        self.records.append(record)
+        self.layout_records()
+
+    def replace_cell(self, record):
+        # create the widget of a shown record again in place
+        index = self.records.index(record)
+        if index in self.shown:
+            self.hide_cell(index)
+            self.show_cell(index)
+
+    def cells(self):
+        # cells in the order grid_save stores them,
+        # same as the children of a BgGridLayout
+        return list(reversed(self.records))
+
+    def cell_widgets(self):
+        return list(self.shown.values())
+
+    def clear_cells(self):
+        for index in list(self.shown):
+            self.hide_cell(index)
+        self.records = []
+        self.scroll_y = 1
+        self.layout_records()
+
+    def detach_cells(self):
+        # hidden cells keep their state but not their
+        # widgets, the texture cache refills them
+        records = self.records
+        self.clear_cells()
+        return records
+
+    def cell_at(self, pos):
+        # cell widget under a window position
+        if self.parent is not None and not self.collide_point(
+            *self.parent.to_widget(*pos)
+        ):
+            return None
+        # to_widget includes the scroll offset, giving
+        # a position in layout coordinates
+        x, y = self.to_widget(*pos)
+        row = int((self.layout.top - y) // self.cell_size)
+        col = int((x - self.layout.x) // (self.width / self.cols))
+        if row < 0 or not 0 <= col < self.cols:
+            return None
+        return self.shown.get(row * self.cols + col)
+
+    def cell_rect(self, index):
+        row, col = divmod(index, self.cols)
+        cell_width = self.width / self.cols
+        x = col * cell_width
+        y = self.layout.height - (row + 1) * self.cell_size
+        return (x, y), (cell_width, self.cell_size)
+
+    def layout_records(self, *args):
+        self.cols = max(1, int(self.width // self.cell_size))
+        rows = math.ceil(len(self.records) / self.cols)
+        self.layout.height = max(rows * self.cell_size, self.height)
+        for index, widget in self.shown.items():
+            widget.pos, widget.size = self.cell_rect(index)
+        self.update_shown()
+
+    def update_shown(self, *args):
+        # rows covered by the viewport, measured from the top
+        top = (1 - self.scroll_y) * max(0, self.layout.height - self.height)
+        first_row = int(top // self.cell_size) - self.overscan
+        last_row = int((top + self.height) // self.cell_size) + self.overscan
+        first = max(0, first_row * self.cols)
+        last = min(len(self.records), (last_row + 1) * self.cols)
+        visible = range(first, last)
+
+        for index in list(self.shown):
+            if index not in visible:
+                self.hide_cell(index)
+        for index in visible:
+            if index not in self.shown:
+                self.show_cell(index)
+
+    def show_cell(self, index):
+        widget = self.records[index].show()
+        widget.size_hint = (None, None)
+        widget.pos, widget.size = self.cell_rect(index)
+        self.layout.add_widget(widget)
+        self.shown[index] = widget
+
+    def hide_cell(self, index):
+        widget = self.shown.pop(index)
+        self.layout.remove_widget(widget)
+        self.records[index].hide()
+
+    def page(self, pages):
+        # scroll by a number of viewport heights
+        scrollable = self.layout.height - self.height
+        if scrollable > 0:
+            scroll_y = self.scroll_y - pages * self.height / scrollable
+            self.scroll_y = min(1, max(0, scroll_y))
+
 
 class TxtPixel(ScrollView):
-    def __init__(self, source=None, source_type=None, app=None, **kwargs):
-        Window.bind(mouse_pos=self.is_mouse_over)
+    def __init__(
+        self, source=None, source_type=None, font_size=None, app=None, **kwargs
+    ):
+        # set by the GridApp hover tracker
         self.mouse_above = False
         self.container = None
         self.font_increment = 2
@@ -138,99 +525,266 @@ class TxtPixel(ScrollView):
         self.source = source
         self.source_type = source_type
         self.app = app
+        # set when state stored by grid_save changes
+        self.dirty = True
+        if font_size is None:
+            font_size = sp(15)
+        self.font_size = float(font_size)
+        # font size of the rendered blocks, while zooming the
+        # blocks are scaled to font_size and rendered again
+        # once zoom_delay passes without another step
+        self.rendered_font_size = self.font_size
+        self.zoom_delay = 0.25
+        self.settle_zoom = Clock.create_trigger(self.apply_zoom, self.zoom_delay)
+        # text is rendered in blocks of lines, only blocks
+        # visible in the scroll window are shown and their
+        # widgets are reused as blocks scroll in and out
+        self.lines_per_block = 64
+        self.blocks = {}
+        self.spare_blocks = []
+        # set by release until added to a grid again
+        self.released = False
+        if app is not None:
+            self.text_textures = app.text_textures
+        else:
+            self.text_textures = LRUCache(16 * 1024 * 1024, max_entries=256)
+        if source_type == "file":
+            self.text_source = TextSource(source)
+        else:
+            self.text_source = TextSource(None)
         super(TxtPixel, self).__init__(**kwargs)
         container_height = 4000
         container_width = 4000
-        filler_height = 2000
-        filler_width = 2000
         grid_container = FloatLayout(size_hint_y=None, size_hint_x=None)
-        filler = BgLabel(
-            text=source_text(source, source_type), size=(filler_width, filler_height)
-        )
-        # set height to None so text will expand with font size
-        # container needs to expand too
-        # the texture_size shows correct values as font increases / decreases
-        filler.text_size = filler_width, None  # filler_height
-        grid_container.add_widget(filler)
         grid_container.height = container_height
         grid_container.width = container_width
         self.container = grid_container
+        with grid_container.canvas.before:
+            PushMatrix()
+            self.zoom_scale = Scale()
+        with grid_container.canvas.after:
+            PopMatrix()
         self.add_widget(grid_container)
-        filler.pos = 0, 0  # (grid_container.width / 2, grid_container.height / 2)
+        self.layout_text()
+        self.bind(scroll_x=self.mark_dirty, scroll_y=self.mark_dirty)
+        self.bind(scroll_y=self.update_blocks, size=self.update_blocks)
 
-    def is_mouse_over(self, instance, value):
-        if self.collide_point(*value):
-            self.mouse_above = True
+    def mark_dirty(self, *args):
+        self.dirty = True
+
+    def release(self):
+        # called when the cell is removed from the grid, the
+        # mapping and its file descriptor are closed now
+        # rather than when the widget is collected
+        self.mouse_above = False
+        self.text_source.close()
+        self.released = True
+
+    def on_parent(self, widget, parent):
+        # a cached grid adds its released widgets again
+        if parent is not None and self.released:
+            self.released = False
+            if self.source_type == "file":
+                self.text_source = TextSource(self.source)
+
+    def state(self):
+        # cell attributes stored by grid_save
+        attributes = {}
+        attributes["source"] = self.source
+        attributes["source_type"] = self.source_type
+        attributes["scroll_x"] = str(self.scroll_x)
+        attributes["scroll_y"] = str(self.scroll_y)
+        attributes["font_size"] = str(self.font_size)
+        return attributes
+
+    def layout_text(self):
+        # size the container for every line at the current
+        # font size and render the visible blocks again
+        for block in list(self.blocks):
+            self.recycle_block(block)
+        self.rendered_font_size = self.font_size
+        line = CoreLabel(text="X", font_size=self.font_size)
+        line.refresh()
+        self.line_height = max(1, line.texture.size[1])
+        text_height = self.text_source.line_count() * self.line_height
+        self.container.height = max(4000, text_height)
+        self.update_blocks()
+
+    def reload(self):
+        # the source changed on disk, render it again at the
+        # same scroll position
+        if self.source_type == "file":
+            self.text_source.close()
+            self.text_source = TextSource(self.source)
+            self.layout_text()
+
+    def window_center(self):
+        # center of the scroll window in container coordinates
+        return (
+            self.scroll_x * max(0, self.container.width - self.width) + self.width / 2,
+            self.scroll_y * max(0, self.container.height - self.height)
+            + self.height / 2,
+        )
+
+    def zoom_text(self):
+        # scale the rendered blocks around the center of the
+        # window, a sharp render follows when zooming settles
+        scale = self.font_size / self.rendered_font_size
+        self.zoom_scale.origin = self.window_center()
+        self.zoom_scale.x = self.zoom_scale.y = scale
+        self.settle_zoom.cancel()
+        self.settle_zoom()
+        self.mark_dirty()
+
+    def apply_zoom(self, *args):
+        if self.font_size == self.rendered_font_size:
+            return
+        with stats.timer("text_zoom"):
+            # keep the text at the center of the window in place
+            scale = self.font_size / self.rendered_font_size
+            center_x, center_y = self.window_center()
+            lines_above = (self.container.height - center_y) / self.line_height
+            self.zoom_scale.x = self.zoom_scale.y = 1
+            self.layout_text()
+            center_x *= scale
+            center_y = self.container.height - lines_above * self.line_height
+            scroll_width = self.container.width - self.width
+            scroll_height = self.container.height - self.height
+            if scroll_width > 0:
+                self.scroll_x = min(
+                    1, max(0, (center_x - self.width / 2) / scroll_width)
+                )
+            if scroll_height > 0:
+                self.scroll_y = min(
+                    1, max(0, (center_y - self.height / 2) / scroll_height)
+                )
+            self.update_blocks()
+
+    def update_blocks(self, *args):
+        block_height = self.lines_per_block * self.line_height
+        # window position measured from the top of the text
+        top = (1 - self.scroll_y) * max(0, self.container.height - self.height)
+        first = int(top // block_height)
+        last = int((top + self.height) // block_height)
+        visible = range(first, last + 1)
+        for block in list(self.blocks):
+            if block not in visible:
+                self.recycle_block(block)
+        for block in visible:
+            if block not in self.blocks:
+                self.render_block(block)
+
+    def block_texture(self, block):
+        # texture of a block at the rendered font size, kept
+        # in the text texture cache of the app so zooming back
+        # to a recent size does not render again
+        try:
+            stat = os.stat(self.source)
+            text_key = (os.path.abspath(self.source), stat.st_size, stat.st_mtime_ns)
+        except (OSError, TypeError, ValueError):
+            text_key = id(self.text_source)
+        key = (text_key, self.lines_per_block, block, self.rendered_font_size)
+        texture = self.text_textures.get(key)
+        if texture is None:
+            lines = self.text_source.lines(
+                block * self.lines_per_block, self.lines_per_block
+            )
+            if not lines:
+                return None
+            with stats.timer("text_render"):
+                label = CoreLabel(
+                    text="\n".join(lines),
+                    font_size=self.rendered_font_size,
+                    halign="left",
+                    valign="top",
+                )
+                label.refresh()
+                texture = label.texture
+            self.text_textures.put(key, texture, texture.width * texture.height * 4)
+        return texture
+
+    def render_block(self, block):
+        texture = self.block_texture(block)
+        if texture is None:
+            return
+        if self.spare_blocks:
+            text_block = self.spare_blocks.pop()
         else:
-            self.mouse_above = False
+            text_block = TextBlock(size_hint=(None, None))
+        text_block.show(texture)
+        block_top = (
+            self.container.height - block * self.lines_per_block * self.line_height
+        )
+        text_block.pos = 0, block_top - text_block.height
+        self.container.add_widget(text_block)
+        self.blocks[block] = text_block
+        # enlarge container as needed
+        # if too large, the texture becomes a black rectangle
+        if text_block.width > self.container.width:
+            self.container.width = text_block.width
+
+    def recycle_block(self, block):
+        text_block = self.blocks.pop(block)
+        self.container.remove_widget(text_block)
+        self.spare_blocks.append(text_block)
 
     def enlarge(self):
         if self.mouse_above is True:
             try:
-                for c in self.container.children:
-                    c.font_size += self.font_increment
-                    # print(c.text_size, c.texture_size, c.size)
-                    # enlarge container as needed
-                    # if too large, label becomes a black rectangle
-                    if c.texture_size[0] > self.container.width:
-                        self.container.width += c.texture_size[0]
-                        self.container.do_layout()
-                    if c.texture_size[1] > self.container.height:
-                        self.container.height += c.texture_size[1]
-                        self.container.do_layout()
+                self.font_size += self.font_increment
+                self.zoom_text()
             except Exception as ex:
                 print(ex)
 
     def shrink(self):
         if self.mouse_above is True:
             try:
-                for c in self.container.children:
-                    c.font_size -= self.font_increment
-                    # if c.texture_size[0] < self.container.width:
-                    #     self.container.width = c.texture_size[0]
-                    # if c.texture_size[1] < self.container.height:
-                    #     self.container.height = c.texture_size[1]
+                self.font_size = max(1, self.font_size - self.font_increment)
+                self.zoom_text()
             except Exception as ex:
                 print(ex)
 
     def jump(self, override_above=False):
         if self.mouse_above is True or override_above is True:
-            for c in self.container.children:
-                self.scroll_x = c.center[0] / self.container.width
-                self.scroll_y = c.center[1] / self.container.height
-                with self.container.canvas:
-                    self.container.canvas.remove_group("trace")
-                    # scale line width with zoom / textsize
-                    line_width = 100
-                    Color(1, 1, 1, .05)
-                    # edge_width = c.width / 4
-                    # edge_height = c.height / 4
-                    # print(c.texture_size, c.center)
-                    Line(
-                        points=(0, 0, c.center[0], c.center[1]),
-                        width=line_width,
-                        group="trace",
-                    )
-                    Line(
-                        points=(self.container.height, 0, c.center[0], c.center[1]),
-                        width=line_width,
-                        group="trace",
-                    )
-                    Line(
-                        points=(
-                            self.container.height,
-                            self.container.width,
-                            c.center[0],
-                            c.center[1],
-                        ),
-                        width=line_width,
-                        group="trace",
-                    )
-                    Line(
-                        points=(0, self.container.width, c.center[0], c.center[1]),
-                        width=line_width,
-                        group="trace",
-                    )
+            if not self.blocks:
+                return
+            # beginning of the visible text
+            c = self.blocks[min(self.blocks)]
+            self.scroll_x = c.center[0] / self.container.width
+            self.scroll_y = c.center[1] / self.container.height
+            with self.container.canvas:
+                self.container.canvas.remove_group("trace")
+                # scale line width with zoom / textsize
+                line_width = 100
+                Color(1, 1, 1, .05)
+                # edge_width = c.width / 4
+                # edge_height = c.height / 4
+                # print(c.texture_size, c.center)
+                Line(
+                    points=(0, 0, c.center[0], c.center[1]),
+                    width=line_width,
+                    group="trace",
+                )
+                Line(
+                    points=(self.container.height, 0, c.center[0], c.center[1]),
+                    width=line_width,
+                    group="trace",
+                )
+                Line(
+                    points=(
+                        self.container.height,
+                        self.container.width,
+                        c.center[0],
+                        c.center[1],
+                    ),
+                    width=line_width,
+                    group="trace",
+                )
+                Line(
+                    points=(0, self.container.width, c.center[0], c.center[1]),
+                    width=line_width,
+                    group="trace",
+                )
 
     def pan_up_left(self):
         if self.mouse_above is True:
@@ -271,58 +825,324 @@ class TxtPixel(ScrollView):
     def punch_in(self):
         if self.mouse_above is True:
             if self.link_to:
-                # save grid first to store x and y positions
-                current_grid = self.app.grid_save()
-                self.app.grid.clear_widgets()
-                self.app.grid_load(self.link_to, previous_grid=current_grid)
+                self.app.grid_navigate(self.link_to)
 
     def punch_out(self):
         if self.mouse_above is True:
             if self.app.previous_grid:
-                current_grid = self.app.grid_save()
-                self.app.grid.clear_widgets()
-                self.app.grid_load(self.app.previous_grid, previous_grid=current_grid)
+                self.app.grid_navigate(self.app.previous_grid)
+
+
+class TileLayer(Widget):
+    # draws the tiles of a pyramid that intersect the visible
+    # window of the cell at the level for the current zoom,
+    # stretched over the layer like the cell Image
+    #
+    # the coarsest level is drawn first, then for tiles still
+    # loading the nearest loaded coarser tile, so the image
+    # refines as tiles arrive
+    def __init__(self, pyramid, cell, app, **kwargs):
+        self.pyramid = pyramid
+        self.cell = cell
+        self.app = app
+        self.pending = set()
+        super(TileLayer, self).__init__(**kwargs)
+        self.redraw = Clock.create_trigger(self.draw)
+        self.bind(pos=self.redraw, size=self.redraw)
+        cell.bind(scroll_x=self.redraw, scroll_y=self.redraw, size=self.redraw)
+
+    def window(self):
+        # (left, bottom, right, top) of the layer shown by the cell
+        def span(scroll, content, viewport):
+            if content <= viewport:
+                return 0, content
+            start = scroll * (content - viewport)
+            return start, start + viewport
+
+        left, right = span(self.cell.scroll_x, self.width, self.cell.width)
+        bottom, top = span(self.cell.scroll_y, self.height, self.cell.height)
+        return left, bottom, right, top
+
+    def tile_texture(self, level, col, row):
+        # loaded texture or None, a missing tile is requested
+        # once its level is built
+        key = (self.pyramid.key, level, col, row)
+        texture = self.app.tile_textures.get(key)
+        if texture is not None:
+            return texture
+        if not self.pyramid.built(level):
+            # one request builds the level, so tile requests
+            # do not hold every decode thread waiting on it
+            build_key = (self.pyramid.key, level)
+            if build_key not in self.pending:
+                self.pending.add(build_key)
+                self.app.decode_pool.submit(
+                    lambda future: self.level_built(build_key, future),
+                    self.pyramid.build,
+                    level,
+                )
+        elif key not in self.pending:
+            self.pending.add(key)
+            self.app.decode_pool.submit(
+                lambda future, key=key: self.loaded(key, future),
+                self.pyramid.tile,
+                level,
+                col,
+                row,
+            )
+        return None
+
+    def level_built(self, build_key, future):
+        self.pending.discard(build_key)
+        try:
+            future.result()
+        except Exception as ex:
+            print(ex)
+            return
+        self.redraw()
+
+    def loaded(self, key, future):
+        # called on the main thread when a tile is decoded
+        self.pending.discard(key)
+        try:
+            width, height, pixels = future.result()
+        except Exception as ex:
+            print(ex)
+            return
+        self.app.tile_textures.put(
+            key, pixels_texture(width, height, pixels), width * height * 4
+        )
+        self.app.thumbnail_changed = True
+        self.redraw()
+
+    def draw(self, *args):
+        if self.width <= 0 or self.height <= 0:
+            return
+        size = self.size
+        scale = max(
+            self.width / self.pyramid.size[0], self.height / self.pyramid.size[1]
+        )
+        level = self.pyramid.level_for(scale)
+        top_level = self.pyramid.levels - 1
+        window = self.window()
+        drawn = []
+        fallbacks = []
+        for col, row in visible_tiles(self.pyramid, top_level, size, window):
+            texture = self.tile_texture(top_level, col, row)
+            if texture is not None:
+                drawn.append((top_level, col, row, texture))
+        if level < top_level:
+            for col, row in visible_tiles(self.pyramid, level, size, window):
+                texture = self.tile_texture(level, col, row)
+                if texture is not None:
+                    drawn.append((level, col, row, texture))
+                    continue
+                # the nearest loaded coarser tile, or one from
+                # a built level while this level is built
+                for coarser in range(level + 1, top_level):
+                    shift = coarser - level
+                    tile = (coarser, col >> shift, row >> shift)
+                    texture = self.app.tile_textures.get((self.pyramid.key,) + tile)
+                    if texture is None and self.pyramid.built(coarser):
+                        texture = self.tile_texture(*tile)
+                    if texture is not None:
+                        if tile + (texture,) not in fallbacks:
+                            fallbacks.append(tile + (texture,))
+                        break
+                    if self.pyramid.built(coarser):
+                        break
+
+        self.canvas.clear()
+        with self.canvas:
+            Color(1, 1, 1, 1)
+            # coarse first so finer tiles are drawn over them
+            for level, col, row, texture in sorted(
+                drawn + fallbacks, key=lambda tile: -tile[0]
+            ):
+                x, y, width, height = tile_rect(self.pyramid, level, col, row, size)
+                Rectangle(
+                    texture=texture, pos=(self.x + x, self.y + y), size=(width, height)
+                )
 
 
 class ImgPixel(ScrollView):
-    def __init__(self, source=None, source_type=None, link_to=None, app=None, **kwargs):
-        Window.bind(mouse_pos=self.is_mouse_over)
+    def __init__(
+        self, source=None, source_type=None, link_to=None, zoom=1, app=None, **kwargs
+    ):
+        # set by the GridApp hover tracker
         self.mouse_above = False
         self.container = None
         self.font_increment = 2
         self.scroll_increment = 0.1
         self.zoom_increment = 1.25
+        self.zoom = float(zoom)
         self.source = source
         self.source_type = source_type
         self.link_to = link_to
         self.app = app
+        # set when state stored by grid_save changes
+        self.dirty = True
+        self.frames = None
+        # frames closed by release
+        self.released = False
         super(ImgPixel, self).__init__(**kwargs)
+        self.bind(scroll_x=self.mark_dirty, scroll_y=self.mark_dirty)
         container_height = 4000
         container_width = 4000
         grid_container = FloatLayout(size_hint_y=None, size_hint_x=None)
-        if source_type == "file":
-            img = Image(source=source)
-            # reload cache if thumbnail has changed
-            img.reload()
+        self.tile_layer = None
+        pyramid = self.deep_zoom_pyramid()
+        if pyramid is not None:
+            # only tiles in view are loaded, at the level
+            # for the zoom
+            img = TileLayer(pyramid, self, self.app)
+            self.tile_layer = img
+        elif source_type == "file" and not source.lower().endswith(".gif"):
+            # empty placeholder until the image is decoded by
+            # the app decode pool, downscaled pixels come from
+            # the texture cache instead of decoding the full
+            # image each time and a changed thumbnail has a
+            # different cache key
+            img = Image(opacity=0)
+            self.app.decode_pool.request(
+                source, container_width * self.zoom, self.decoded
+            )
+        elif source_type == "file":
+            # animated, frames are decoded as they are shown
+            # and advanced by the app animator while the
+            # cell is in the grid
+            img = Image()
+            self.open_frames(img)
         elif source_type == "bytes":
             img = Image()
-            img.texture = CoreImage(source, ext="jpg").texture
+            # a new stream each time, a record can create its
+            # widget again from the same bytes
+            img.texture = CoreImage(io.BytesIO(source), ext="jpg").texture
             img.size = img.texture_size
 
+        self.image = img
         grid_container.add_widget(img)
-        img.size = img.texture_size
-        img.allow_stretch = True
-        img.keep_ratio = False
-        grid_container.height = container_height
-        grid_container.width = container_width
+        if self.tile_layer is None:
+            img.size = img.texture_size
+            img.allow_stretch = True
+            img.keep_ratio = False
+        grid_container.height = container_height * self.zoom
+        grid_container.width = container_width * self.zoom
         self.container = grid_container
         self.add_widget(grid_container)
 
-    def is_mouse_over(self, instance, value):
-        if self.collide_point(*value):
-            self.mouse_above = True
-        else:
-            self.mouse_above = False
+    def mark_dirty(self, *args):
+        self.dirty = True
+
+    def release(self):
+        # called when the cell is removed from the grid, gif
+        # frames and their file are closed now rather than
+        # when the widget is collected
+        self.mouse_above = False
+        if self.frames is not None and not self.released:
+            self.app.animator.remove(self)
+            self.frames.close()
+            self.released = True
+
+    def deep_zoom_pyramid(self):
+        # tile pyramid of the source in deep zoom mode, for
+        # images larger than one tile
+        if not self.app.deep_zoom or self.source_type != "file":
+            return None
+        if self.source.lower().endswith(".gif"):
+            return None
+        try:
+            pyramid = self.app.tiles.pyramid(self.source)
+        except Exception as ex:
+            print(ex)
+            return None
+        if pyramid.levels < 2:
+            return None
+        return pyramid
+
+    def reload(self):
+        # the source changed on disk, such as the
+        # thumbnail of a linked grid
+        if self.tile_layer is not None:
+            pyramid = self.deep_zoom_pyramid()
+            if pyramid is not None:
+                self.tile_layer.pyramid = pyramid
+                self.tile_layer.redraw()
+        elif self.source_type == "file" and not self.source.lower().endswith(".gif"):
+            self.app.decode_pool.request(self.source, 4000 * self.zoom, self.decoded)
+        elif self.source_type == "file":
+            if self.frames is not None:
+                self.frames.close()
+            self.open_frames(self.image)
+
+    def open_frames(self, img):
+        self.frames = GifFrames(self.source)
+        self.frame_index = 0
+        # milliseconds the current frame has been shown
+        self.frame_time = 0
+        img.texture = pixels_texture(*self.frames.size, self.frames.frame(0))
+
+    def on_parent(self, widget, parent):
+        # only animate while in a grid
+        if self.frames is None:
+            return
+        if parent is None:
+            self.app.animator.remove(self)
+            return
+        if self.released:
+            # a cached grid adds its released widgets again
+            self.released = False
+            try:
+                self.frames = GifFrames(self.source)
+            except OSError as ex:
+                print(ex)
+                self.frames = None
+                return
+            if self.frame_index >= self.frames.n_frames:
+                self.frame_index = 0
+        if self.frames.n_frames > 1:
+            self.app.animator.add(self)
+
+    def animate(self, dt):
+        # called by the app animator while visible
+        self.frame_time += dt * 1000
+        duration = self.frames.duration(self.frame_index)
+        if self.frame_time < duration:
+            return
+        # skip ahead at most one frame after a stall
+        self.frame_time = min(self.frame_time - duration, duration)
+        self.frame_index = (self.frame_index + 1) % self.frames.n_frames
+        self.image.texture.blit_buffer(
+            self.frames.frame(self.frame_index), colorfmt="rgba", bufferfmt="ubyte"
+        )
+        self.image.canvas.ask_update()
+
+    def decoded(self, future):
+        # called on the main thread when decoding finishes
+        try:
+            width, height, pixels = future.result()
+            self.image.texture = pixels_texture(width, height, pixels)
+        except Exception as ex:
+            print(ex)
+            self.image.source = self.source
+        self.image.opacity = 1
+        # the grid thumbnail no longer matches
+        self.app.thumbnail_changed = True
+
+    def state(self):
+        # cell attributes stored by grid_save
+        attributes = {}
+        # since widgets are using image / bytes as source
+        # try to use link_to to substitute xml
+        attributes["source"] = self.source
+        attributes["source_type"] = self.source_type
+        if self.link_to:
+            attributes["source"] = self.link_to
+            attributes["source_type"] = "file"
+        attributes["scroll_x"] = str(self.scroll_x)
+        attributes["scroll_y"] = str(self.scroll_y)
+        attributes["zoom"] = str(self.zoom)
+        return attributes
 
     def enlarge(self):
         if self.mouse_above is True:
@@ -332,6 +1152,8 @@ class ImgPixel(ScrollView):
                 # in upper left corner as container shrinks
                 self.container.width *= self.zoom_increment
                 self.container.height *= self.zoom_increment
+                self.zoom *= self.zoom_increment
+                self.mark_dirty()
             except Exception as ex:
                 print(ex)
 
@@ -343,6 +1165,8 @@ class ImgPixel(ScrollView):
                 # in upper left corner as container shrinks
                 self.container.width /= self.zoom_increment
                 self.container.height /= self.zoom_increment
+                self.zoom /= self.zoom_increment
+                self.mark_dirty()
             except Exception as ex:
                 print(ex)
 
@@ -391,17 +1215,12 @@ class ImgPixel(ScrollView):
     def punch_in(self):
         if self.mouse_above is True:
             if self.link_to:
-                # save grid first to store x and y positions
-                current_grid = self.app.grid_save()
-                self.app.grid.clear_widgets()
-                self.app.grid_load(self.link_to, previous_grid=current_grid)
+                self.app.grid_navigate(self.link_to)
 
     def punch_out(self):
         if self.mouse_above is True:
             if self.app.previous_grid:
-                current_grid = self.app.grid_save()
-                self.app.grid.clear_widgets()
-                self.app.grid_load(self.app.previous_grid, previous_grid=current_grid)
+                self.app.grid_navigate(self.app.previous_grid)
 
 
 class GridApp(App):
@@ -409,36 +1228,117 @@ class GridApp(App):
         self._keyboard = Window.request_keyboard(self._keyboard_closed, self)
         self._keyboard.bind(on_key_down=self._on_keyboard_down)
         self.actions = bindings.keybindings()
+        self.dispatch_index = bindings.compile_bindings(self.actions)
+        self.dispatch_targets = {}
+        # cell under the pointer, see hover
+        self.hovered = None
         self.data_dir = pathlib.PurePath(XDG_DATA_HOME, "grids")
         self.config_dir = pathlib.PurePath(XDG_CONFIG_HOME, "grids")
+        self.cache_dir = pathlib.PurePath(XDG_CACHE_HOME, "grids")
         self.current_grid = None
         self.previous_grid = None
         self.save_interval = 10
-        self.current_thumbnail_hash = None
+        # hashes of the pixels last written for each grid
+        self.thumbnail_hashes = {}
+        # largest side of saved thumbnails, None for full size
+        self.thumbnail_size = kwargs.get("thumbnail_size")
+        self.thumbnail_compression = kwargs.get("thumbnail_compression", 6)
+        self.thumbnail_quality = kwargs.get("thumbnail_quality", 90)
+        # format of thumbnails saved to the db, the
+        # data dir always holds png for nesting grids
+        self.thumbnail_format = kwargs.get("thumbnail_format", "png")
+        # journal entries before compacting into the xml
+        self.journal_limit = 50
+        self.grid_reordered = False
+        self.thumbnail_changed = False
         self.use_db = False
         self.session_uuid = None
+        self.virtual = kwargs.get("virtual", False)
+        # encoding, hashing and writing of saves happens
+        # on the worker, off of the main thread
+        self.save_worker = SaveWorker(self.grid_write, merge_snapshots)
+        self.save_worker.start()
 
         if "unique_session" in kwargs:
             if kwargs["unique_session"] is True:
                 self.session_uuid = str(uuid.uuid4())
 
-        for directory in [self.data_dir, self.config_dir]:
+        for directory in [self.data_dir, self.config_dir, self.cache_dir]:
             if not os.path.isdir(directory):
                 os.mkdir(directory)
             else:
                 print("{} found".format(directory))
+
+        self.texture_cache = TextureCache(pathlib.PurePath(self.cache_dir, "textures"))
+        # trim stale entries without holding up startup
+        threading.Thread(target=self.texture_cache.evict, daemon=True).start()
+        self.decode_pool = DecodePool(self.texture_cache)
+        # tile pyramids of large images for deep zoom, tiles
+        # are streamed in as they come into view
+        self.deep_zoom = kwargs.get("deep_zoom", False)
+        self.tiles = TileStore(pathlib.PurePath(self.cache_dir, "tiles"))
+        if self.deep_zoom:
+            threading.Thread(target=self.tiles.evict, daemon=True).start()
+        self.tile_textures = LRUCache(
+            kwargs.get("tile_cache_size", 256) * 1024 * 1024, max_entries=4096
+        )
+        # rendered blocks of text cells at recent font sizes
+        self.text_textures = LRUCache(64 * 1024 * 1024, max_entries=1024)
+        # cells of the current grid are reloaded in place
+        # when their files change, see watch_cells
+        self.watcher = None
+        if kwargs.get("watch", "inotify") != "off":
+            self.watcher = FileWatcher(
+                self.files_changed, use_inotify=kwargs.get("watch") != "poll"
+            )
+        # one clock event for every animated cell
+        self.animator = Animator()
+        # index of saved grids, updated by grid_write
+        try:
+            self.catalog = Catalog(pathlib.PurePath(self.cache_dir, "catalog.sqlite"))
+        except Exception as ex:
+            print(ex)
+            self.catalog = None
+        # content hashes of cell sources, see hash_cells
+        self.hasher = ContentHasher(pathlib.PurePath(self.cache_dir, "hashes.sqlite"))
+        # textures and representations shared with other
+        # machines through the db, see prefetch_shared
+        self.shared_cache = None
+        if kwargs.get("shared_cache"):
+            from grids import db
+
+            self.shared_cache = db.SharedCache(
+                db.connect(
+                    kwargs["db_host"],
+                    kwargs["db_port"],
+                    socket_timeout=1,
+                    socket_connect_timeout=1,
+                ),
+                max_bytes=kwargs.get("shared_cache_size", 1024) * 1024 * 1024,
+            )
+            self.texture_cache.shared = self.shared_cache
+            self.texture_cache.hasher = self.hasher
+        # placeholders for nested grids without a thumbnail
+        self._representations = None
+        # recently visited grids kept built for punch_in
+        # and punch_out, evicted grids release their cells
+        self.grid_cache = LRUCache(
+            kwargs.get("grid_cache_size", 512) * 1024 * 1024,
+            on_evict=self.release_records,
+        )
         if "files" in kwargs:
             # use abspath for now when loading xml from xdg data dir
             # may revisit to make grids more portable
             self.files = [os.path.abspath(f) for f in kwargs["files"]]
 
         if kwargs["use_db"]:
+            # redis is only imported when the db is used
+            from grids import db
+
             self.use_db = True
-            db_settings = {"host": kwargs["db_host"], "port": kwargs["db_port"]}
-            self.binary_r = redis.StrictRedis(**db_settings)
-            self.redis_conn = redis.StrictRedis(**db_settings, decode_responses=True)
-            self.db_port = self.redis_conn.connection_pool.connection_kwargs["port"]
-            self.db_host = self.redis_conn.connection_pool.connection_kwargs["host"]
+            self.db_conn = db.connect(kwargs["db_host"], kwargs["db_port"])
+            self.db_port = self.db_conn.connection_pool.connection_kwargs["port"]
+            self.db_host = self.db_conn.connection_pool.connection_kwargs["host"]
 
         super(GridApp, self).__init__()
 
@@ -477,260 +1377,604 @@ class GridApp(App):
                     break
 
     def _on_keyboard_down(self, keyboard, keycode, text, modifiers):
-        for actions in ["app", self.root.current_tab.tab_name]:
-            try:
-                for k, v in self.actions[actions].items():
-                    if keycode[1] in v[0] and not v[1] and not modifiers:
-                        try:
-                            getattr(self, "{}".format(k))()
-                        except Exception as ex:
-                            # print(ex)
-                            pass
-                        # use .content.children for tabs
-                        for c in self.root.current_tab.content.children:
-                            try:
-                                getattr(c, "{}".format(k))()
-                            except Exception as ex:
-                                print(ex)
-
-                        for lower_widget in self.root.current_tab.sub_content:
-                            for c in lower_widget.children:
-                                try:
-                                    getattr(c, "{}".format(k))()
-                                except Exception as ex:
-                                    print(ex)
-
-                    elif keycode[1] in v[0] and modifiers:
-                        if len(set(v[1]).intersection(set(modifiers))) == len(
-                            modifiers
-                        ):
-                            try:
-                                getattr(self, "{}".format(k))()
-                            except Exception as ex:
-                                # print(ex)
-                                pass
-
-                            for c in self.root.current_tab.content.children:
-                                try:
-                                    getattr(c, "{}".format(k))()
-                                except Exception as ex:
-                                    print(ex)
-
-                            for lower_widget in self.root.current_tab.sub_content:
-                                for c in lower_widget.children:
-                                    try:
-                                        getattr(c, "{}".format(k))()
-                                    except Exception as ex:
-                                        print(ex)
-            except KeyError:
-                pass
+        with stats.timer("key_dispatch"):
+            self.dispatch_key(keycode, modifiers)
+
+    def dispatch_key(self, keycode, modifiers):
+        modifiers = frozenset(modifiers)
+        for domain in ["app", self.root.current_tab.tab_name]:
+            targets = self.action_targets(domain, keycode[1], modifiers)
+            for target in targets:
+                try:
+                    target()
+                except Exception as ex:
+                    print(ex)
+                if targets is not self.dispatch_targets.get(
+                    (self.root.current_tab, domain, keycode[1], modifiers)
+                ):
+                    # the action changed the widgets, such as
+                    # punching into another grid
+                    break
+
+    def action_targets(self, domain, key, modifiers):
+        # bound methods for a key press, resolved once and
+        # kept until bindings or the tab's widgets change
+        tab = self.root.current_tab
+        targets = self.dispatch_targets.get((tab, domain, key, modifiers))
+        if targets is None:
+            widgets = [self]
+            # use .content.children for tabs
+            if tab.content is not None:
+                widgets.extend(tab.content.children)
+            for lower_widget in tab.sub_content:
+                widgets.extend(lower_widget.children)
+            targets = []
+            for action in self.dispatch_index.get((domain, key, modifiers), []):
+                for widget in widgets:
+                    target = getattr(widget, action, None)
+                    if callable(target):
+                        targets.append(target)
+            self.dispatch_targets[(tab, domain, key, modifiers)] = targets
+        return targets
+
+    def hover(self, *args):
+        # one tracker for the window marks the cell under
+        # the pointer instead of every cell checking
+        # every mouse move
+        cell = self.grid.cell_at(Window.mouse_pos)
+        if cell is not self.hovered:
+            if self.hovered is not None:
+                self.hovered.mouse_above = False
+            self.hovered = cell
+        if cell is not None:
+            cell.mouse_above = True
+
+    def bindings_changed(self, *args):
+        self.dispatch_index = bindings.compile_bindings(self.actions)
+        self.dispatch_targets.clear()
+
+    def widgets_changed(self, *args):
+        self.dispatch_targets.clear()
+
+    def watch_tab(self, tab):
+        # resolved key targets are dropped when widgets
+        # that handle keybinds are added or removed
+        if tab.content is not None:
+            tab.content.bind(children=self.widgets_changed)
+        for lower_widget in tab.sub_content:
+            lower_widget.bind(children=self.widgets_changed)
 
     @property
     def grid_hash(self):
         return hashlib.sha1("".join(sorted(self.files)).encode()).hexdigest()
 
     def grid_thumbnail(self):
-        self.grid.export_to_png(str(pathlib.PurePath(self.data_dir, self.thumbnail)))
+        # read the grid pixels back from an offscreen fbo,
+        # pixels are rgba and ordered top to bottom
+        with stats.timer("export"):
+            texture = self.grid.export_as_image().texture
+            return texture.pixels, texture.size
 
     @property
     def thumbnail(self):
         return "{}.png".format(self.grid_hash)
 
-    def file_bytes(self, filename, delete_file=False):
+    def thumbnail_encode(self, pixels, size, image_format="png"):
+        # encode rgba pixels in memory, scaled down
+        # to fit thumbnail_size if it is set
+        with stats.timer("thumbnail_encode"):
+            return self.encode_pixels(pixels, size, image_format)
+
+    def encode_pixels(self, pixels, size, image_format):
+        from PIL import Image as PILImage
+
+        thumbnail_img = PILImage.frombytes("RGBA", size, pixels)
+        if self.thumbnail_size and max(size) > self.thumbnail_size:
+            thumbnail_img.thumbnail(
+                (self.thumbnail_size, self.thumbnail_size), PILImage.BILINEAR
+            )
+        if image_format == "jpeg":
+            thumbnail_img = thumbnail_img.convert("RGB")
         contents = io.BytesIO()
+        thumbnail_img.save(
+            contents,
+            image_format,
+            compress_level=self.thumbnail_compression,
+            quality=self.thumbnail_quality,
+        )
+        thumbnail_img.close()
+        return contents.getvalue()
+
+    def db_save(self, thumbnail_bytes, grid_hash):
+        from grids import db
+
+        with stats.timer("db_write"):
+            return db.save(
+                self.db_conn,
+                thumbnail_bytes,
+                grid_hash,
+                self.session_uuid,
+            )
+
+    def mark_reordered(self, *args):
+        self.grid_reordered = True
+
+    def grid_snapshot(self, rewrite=False):
+        # gather everything a save needs from the widgets,
+        # must be called from the main thread
+        cells = []
+        changed = []
+        for order, child in enumerate(self.grid.cells()):
+            cell = child.state()
+            cell["position"] = str(order)
+            cells.append(cell)
+            if child.dirty:
+                changed.append(cell)
+                child.dirty = False
+
+        if self.grid_reordered:
+            rewrite = True
+            self.grid_reordered = False
+
+        self.files = [os.path.abspath(cell["source"]) for cell in cells]
+        snapshot = {
+            "cells": cells,
+            "changed": changed,
+            "rewrite": rewrite,
+            "grid_hash": self.grid_hash,
+            "thumbnail": self.thumbnail,
+            "file": str(
+                pathlib.PurePath(self.data_dir, "{}.xml".format(self.grid_hash))
+            ),
+        }
+        if changed or rewrite or self.thumbnail_changed:
+            snapshot["pixels"], snapshot["size"] = self.grid_thumbnail()
+            self.thumbnail_changed = False
+        return snapshot
+
+    def grid_save(self, wait=False, rewrite=False):
+        # saves without changed cells or pixels are skipped,
+        # rewrite=True writes the full xml and compacts the journal
+        snapshot = self.grid_snapshot(rewrite=rewrite)
+        if "pixels" in snapshot:
+            self.save_worker.submit(snapshot["file"], snapshot)
+        if wait:
+            self.save_worker.flush(snapshot["file"])
+        return snapshot["file"]
+
+    def grid_write(self, snapshot):
+        # called on the save worker thread
+        file = snapshot["file"]
+        thumbnail_fullpath = str(pathlib.PurePath(self.data_dir, snapshot["thumbnail"]))
+        # compare a hash of the raw pixels so unchanged
+        # saves skip encoding and writing the png
+        with stats.timer("thumbnail_hash"):
+            pixels_hash = hashlib.blake2b(snapshot["pixels"], digest_size=16).digest()
+        pixels_changed = pixels_hash != self.thumbnail_hashes.get(file)
+        if pixels_changed or not os.path.isfile(thumbnail_fullpath):
+            thumbnail_bytes = self.thumbnail_encode(
+                snapshot["pixels"], snapshot["size"]
+            )
+            tmp_thumbnail = "{}.tmp".format(thumbnail_fullpath)
+            with open(tmp_thumbnail, "wb") as f:
+                f.write(thumbnail_bytes)
+            os.replace(tmp_thumbnail, thumbnail_fullpath)
+            self.thumbnail_hashes[file] = pixels_hash
+
+        if snapshot["rewrite"] or not os.path.isfile(file):
+            self.hash_cells(snapshot["cells"])
+            with stats.timer("xml_write"):
+                state.write_grid(
+                    file, snapshot["thumbnail"], snapshot["cells"], snapshot["size"]
+                )
+            print("grid saved: {}".format(file))
+            self.catalog_update(snapshot, cells_changed=True)
+        elif snapshot["changed"]:
+            # append changed cells to the journal and
+            # compact into the xml once it has grown
+            with stats.timer("journal_write"):
+                entries = state.journal_append(file, snapshot["changed"])
+            if entries >= self.journal_limit:
+                self.hash_cells(snapshot["cells"])
+                with stats.timer("xml_write"):
+                    state.write_grid(
+                        file, snapshot["thumbnail"], snapshot["cells"], snapshot["size"]
+                    )
+                print("grid saved: {}".format(file))
+            else:
+                print("grid journaled: {}".format(file))
+            self.catalog_update(snapshot)
+        # only save to db if image has changed
+        if pixels_changed and self.use_db:
+            if self.thumbnail_format != "png":
+                thumbnail_bytes = self.thumbnail_encode(
+                    snapshot["pixels"], snapshot["size"], self.thumbnail_format
+                )
+            self.db_save(thumbnail_bytes, snapshot["grid_hash"])
 
-        with open(filename, "rb") as f:
-            contents = io.BytesIO(f.read())
-
-        contents = contents.getvalue()
-        return contents
-
-    def db_save(self, thumbnail_filename, grid_hash):
-        slurped = []
-        binary_blob_prefix = "binary:"
-        if self.session_uuid is None:
-            blob_uuid = grid_hash
-        else:
-            blob_uuid = self.session_uuid
-
-        blob_uuid = binary_blob_prefix + blob_uuid
-        self.binary_r.set(blob_uuid, self.file_bytes(thumbnail_filename))
-
-        glworb = {}
-        if self.session_uuid is None:
-            glworb["uuid"] = grid_hash
-        else:
-            glworb["uuid"] = self.session_uuid
-        glworb["binary_key"] = blob_uuid
-        glworb["created"] = str(datetime.datetime.now())
-        glworb["slurp_method"] = "grids"  # self.slurp_method
-        # try:
-        #     glworb['slurp_source_uid'] = device['uid']
-        #     glworb['slurp_source_name'] =  device['name']
-        # except:
-        #     pass
-        # for k, v in metadata.items():
-        #     glworb[k] = v
-        glworb_uuid = "glworb:{}".format(glworb["uuid"])
-        self.redis_conn.hmset(glworb_uuid, glworb)
-        slurped.append(glworb_uuid)
-        return slurped
-
-    def grid_save(self):
-        grid_files = []
-        root = etree.Element("grid")
-        for order, child in enumerate(self.grid.children):
-            cell = etree.Element("cell")
-            # since widgets are using image / bytes as source
-            # try to use link_to to substitute xml
+        # the png shows this save, mark it at least as new
+        # as the xml and journal so gg maintain keeps it
+        if self.thumbnail_hashes.get(file) == pixels_hash:
             try:
-                cell.set("source", child.source)
-                cell.set("source_type", child.source_type)
+                os.utime(thumbnail_fullpath)
+            except OSError as ex:
+                print(ex)
+        return file
+
+    def hash_cells(self, cells):
+        # record content hashes so a cell can be found if its
+        # source moves. only hashes already cached are used,
+        # sources not hashed yet are hashed in the background
+        # and recorded by a later save, so saves and the
+        # grid_navigate waiting on them never read whole files
+        for cell in cells:
+            if cell["source_type"] == "file" and not cell["source"].endswith(".xml"):
                 try:
-                    if child.link_to:
-                        cell.set("source", child.link_to)
-                except AttributeError:
-                    pass
-            except TypeError:
-                cell.set("source", child.link_to)
-                cell.set("source_type", "file")
-            # fov
-            cell.set("scroll_x", str(child.scroll_x))
-            cell.set("scroll_y", str(child.scroll_y))
-            cell.set("position", str(order))
-            # set zoom and font size too
-            # with open(cell.attrib["source"],'rb') as f:
-            #      cell.set("filehash", hashlib.sha1(f.read()).hexdigest())
-
-            grid_files.append(cell.attrib["source"])
-            root.append(cell)
-
-        self.files = [os.path.abspath(f) for f in grid_files]
-        root.set("thumbnail", self.thumbnail)
-        self.grid_thumbnail()
-        # save to file
-        et = etree.ElementTree(root)
-        file = str(pathlib.PurePath(self.data_dir, "{}.xml".format(self.grid_hash)))
-        et.write(file, pretty_print=True)
-        print("grid saved: {}".format(file))
-        # only save to db if image has changed
-        # use glworb:grid_hash by default
-        # use binary:grid_hash by default to overwrite
-        thumbnail_fullpath = str(pathlib.PurePath(self.data_dir, self.thumbnail))
-        thumbnail_hash = hashlib.sha1(self.file_bytes(thumbnail_fullpath)).hexdigest()
-        if thumbnail_hash != self.current_thumbnail_hash:
-            # hash has changed saving grid to db
-            if self.use_db:
-                self.db_save(thumbnail_fullpath, self.grid_hash)
-                self.current_thumbnail_hash = thumbnail_hash
+                    filehash = self.hasher.known(cell["source"])
+                except OSError as ex:
+                    print(ex)
+                    continue
+                if filehash is None:
+                    self.hasher.hash_later(cell["source"])
+                else:
+                    cell["filehash"] = filehash
+
+    def relocate_cells(self, file, records):
+        # point records of cells with a missing source at a
+        # file with the same filehash, searching the directories
+        # of the other cells. locating can hash files so it runs
+        # on a thread and the results are applied on the main
+        # thread by cells_relocated
+        search_dirs = set()
+        missing = []
+        for cell, record in records:
+            source = cell.get("source", "")
+            if os.path.isfile(source):
+                search_dirs.add(os.path.dirname(source))
+            elif cell.get("filehash") is not None and not os.path.exists(source):
+                missing.append((cell["filehash"], record))
+        if not missing:
+            return
+
+        def locate():
+            relocated = []
+            for filehash, record in missing:
+                try:
+                    found = self.hasher.locate(filehash, sorted(search_dirs))
+                except Exception as ex:
+                    print(ex)
+                    continue
+                if found is not None:
+                    relocated.append((record, found))
+            if relocated:
+                Clock.schedule_once(lambda dt: self.cells_relocated(file, relocated), 0)
+
+        threading.Thread(target=locate, daemon=True).start()
+
+    def cells_relocated(self, file, relocated):
+        # grids left before their cells were located find
+        # them again when next loaded
+        if file != self.current_grid:
+            return
+        for record, found in relocated:
+            if record not in self.grid.records:
+                continue
+            print("cell relocated: {} -> {}".format(record.kwargs["source"], found))
+            record.kwargs["source"] = found
+            if record.widget is not None:
+                self.grid.replace_cell(record)
+        # relocated sources change the grid, write it out
+        self.grid_reordered = True
+        self.watch_cells()
+
+    def catalog_update(self, snapshot, cells_changed=False):
+        # cells are only added or removed by a full write,
+        # other saves only change when the grid was saved
+        if self.catalog is None:
+            return
+        try:
+            if cells_changed:
+                self.catalog.update(
+                    snapshot["file"], snapshot["thumbnail"], snapshot["cells"]
+                )
+            else:
+                self.catalog.touch(snapshot["file"])
+        except Exception as ex:
+            print(ex)
 
-        return file
+    @property
+    def representations(self):
+        # placeholders for nested grids without a thumbnail,
+        # created on first use since they need the renderer
+        if self._representations is None:
+            from grids.render import RepresentationCache
+
+            self._representations = RepresentationCache(
+                pathlib.PurePath(self.cache_dir, "representations")
+            )
+            self._representations.shared = self.shared_cache
+        return self._representations
+
+    def prefetch_shared(self, records):
+        # look up textures and representations of the cells
+        # missing here in the shared cache, in batches, before
+        # the cells are shown
+        if self.shared_cache is None:
+            return
+        textures = []
+        links = []
+        for record in records:
+            kwargs = record.kwargs
+            size = 4000 * float(kwargs.get("zoom", 1))
+            if kwargs.get("link_to"):
+                thumbnail = os.path.splitext(kwargs["link_to"])[0] + ".png"
+                if os.path.isfile(thumbnail):
+                    textures.append((thumbnail, size))
+                else:
+                    links.append(kwargs["link_to"])
+            elif (
+                record.cell_class is ImgPixel
+                and kwargs.get("source_type") == "file"
+                and not kwargs["source"].lower().endswith(".gif")
+            ):
+                textures.append((kwargs["source"], size))
+        # deep zoom cells are drawn from tiles instead
+        if not self.deep_zoom:
+            self.texture_cache.prefetch(textures)
+        if links:
+            threading.Thread(
+                target=self.representations.prefetch, args=(links,), daemon=True
+            ).start()
+
+    def nested_thumbnail(self, file):
+        # (source, source_type) for a cell linking to a grid,
+        # its png or the jpeg bytes of a representation
+        thumbnail = os.path.splitext(file)[0] + ".png"
+        if os.path.isfile(thumbnail):
+            return thumbnail, "file"
+        try:
+            return self.representations.load(file).getvalue(), "bytes"
+        except Exception as ex:
+            print(ex)
+            return None, None
+
+    def cell_record(self, cell):
+        # record for the attributes of a stored cell
+        source = cell["source"]
+        if source.endswith(".xml"):
+            return CellRecord(
+                ImgPixel,
+                source=None,
+                source_type=None,
+                link_to=source,
+                scroll_x=cell["scroll_x"],
+                scroll_y=cell["scroll_y"],
+                zoom=cell.get("zoom", 1),
+                app=self,
+            )
+        elif source.lower().endswith(image_extensions):
+            return CellRecord(
+                ImgPixel,
+                source=source,
+                source_type=cell["source_type"],
+                scroll_x=cell["scroll_x"],
+                scroll_y=cell["scroll_y"],
+                zoom=cell.get("zoom", 1),
+                app=self,
+            )
+        return CellRecord(
+            TxtPixel,
+            source=source,
+            source_type=cell["source_type"],
+            scroll_x=cell["scroll_x"],
+            scroll_y=cell["scroll_y"],
+            font_size=cell.get("font_size"),
+            app=self,
+        )
 
     def grid_load(self, file, previous_grid=None):
         print("grid loading: {}".format(file))
-        parser = etree.XMLParser()
-        file_tree = etree.parse(file, parser)
-        file_root = file_tree.getroot()
-        cells = []
-
-        for element in file_root.iter("cell"):
+        # the grid may still be being written by the save worker
+        self.save_worker.flush(file)
+        with stats.timer("xml_parse"):
+            # cells are streamed from the xml without building
+            # a tree, with any journaled changes applied
+            cells = state.load_cells(file)
+        cells.sort(key=lambda cell: int(cell["position"]))
+
+        records = []
+        cell_records = []
+        for cell in cells:
             try:
-                if isinstance(element.tag, str):
-                    # insert into list to use position when adding widgets
-                    thumbnail = None
-                    if element.attrib["source"].endswith(".xml"):
-                        thumbnail = None
-                        thumbnail = str(
-                            pathlib.PurePath(
-                                self.data_dir,
-                                element.attrib["source"].replace(".xml", ".png"),
-                            )
-                        )
-                        source_type = "file"
-                        if not os.path.isfile(thumbnail):
-                            # generate a thumbnail representation with PIL
-                            file_root = etree.parse(element.attrib["source"]).getroot()
-                            thumbnail = grid_representation_img(file_root)
-                            source_type = "bytes"
-
-                        if thumbnail:
-                            cells.insert(
-                                int(element.attrib["position"]),
-                                ImgPixel(
-                                    source=thumbnail,
-                                    source_type=source_type,
-                                    link_to=element.attrib["source"],
-                                    scroll_x=element.attrib["scroll_x"],
-                                    scroll_y=element.attrib["scroll_y"],
-                                    app=self,
-                                ),
-                            )
-                        else:
-                            cells.insert(
-                                int(element.attrib["position"]),
-                                TxtPixel(
-                                    source=element.attrib["source"],
-                                    source_type=element.attrib["source_type"],
-                                    scroll_x=element.attrib["scroll_x"],
-                                    scroll_y=element.attrib["scroll_y"],
-                                    app=self,
-                                ),
-                            )
-                    elif (
-                        element.attrib["source"].lower().endswith(".png")
-                        or element.attrib["source"].lower().endswith(".jpg")
-                        or element.attrib["source"].lower().endswith(".jpeg")
-                        or element.attrib["source"].lower().endswith(".gif")
-                    ):
-                        cells.insert(
-                            int(element.attrib["position"]),
-                            ImgPixel(
-                                source=element.attrib["source"],
-                                source_type=element.attrib["source_type"],
-                                scroll_x=element.attrib["scroll_x"],
-                                scroll_y=element.attrib["scroll_y"],
-                                app=self,
-                            ),
-                        )
-                    else:
-                        cells.insert(
-                            int(element.attrib["position"]),
-                            TxtPixel(
-                                source=element.attrib["source"],
-                                source_type=element.attrib["source_type"],
-                                scroll_x=element.attrib["scroll_x"],
-                                scroll_y=element.attrib["scroll_y"],
-                                app=self,
-                            ),
-                        )
+                record = self.cell_record(cell)
             except Exception as ex:
                 print(ex)
+                continue
+            records.append(record)
+            cell_records.append((cell, record))
 
-        rows = math.ceil(len(cells) / 2)
-        cols = math.ceil(len(cells) / 2)
-        if len(cells) == 2:
-            cols += 1
+        self.prefetch_shared(records)
+        self.grid.layout_cells(len(records))
+        for record in reversed(records):
+            self.grid.add_cell(record)
 
-        self.grid.rows = rows
-        self.grid.cols = cols
-
-        for cell in reversed(cells):
-            self.grid.add_widget(cell)
+        # cells match what is stored, nothing to save yet
+        for cell in self.grid.cells():
+            cell.dirty = False
+        self.grid_reordered = False
 
         if previous_grid:
             self.previous_grid = previous_grid
 
         self.current_grid = file
+        self.watch_cells()
+        self.relocate_cells(file, cell_records)
+
+    def grid_navigate(self, file):
+        # save grid first to store x and y positions, wait
+        # so thumbnails of linked grids are up to date
+        current_grid = self.grid_save(wait=True)
+        cached = self.grid_cache.take(file)
+        records = self.grid.detach_cells()
+        self.grid_cache.put(
+            current_grid,
+            (records, self.cached_signature(current_grid)),
+            sum(record.texture_bytes() for record in records),
+        )
+        if cached is not None and cached[1] == self.cached_signature(file):
+            self.grid_attach(file, cached[0], previous_grid=current_grid)
+        else:
+            if cached is not None:
+                self.release_records(cached)
+            self.grid_load(file, previous_grid=current_grid)
+
+    def cached_signature(self, file):
+        # a cached grid is only reused if its xml and journal
+        # are unchanged, linked thumbnails are checked by
+        # grid_attach
+        return state.file_signature([file, state.journal_file(file)])
+
+    def grid_attach(self, file, records, previous_grid=None):
+        # swap in the records of a cached grid
+        print("grid swapped in: {}".format(file))
+        self.grid.layout_cells(len(records))
+        for record in records:
+            self.grid.add_cell(record)
+            if (
+                record.widget is not None
+                and record.kwargs.get("link_to")
+                and record.kwargs["source_type"] == "file"
+            ):
+                # the linked grid may have been saved since
+                try:
+                    if os.stat(record.kwargs["source"]).st_mtime_ns > record.loaded:
+                        record.loaded = time.time_ns()
+                        record.widget.reload()
+                except OSError as ex:
+                    print(ex)
+        self.grid_reordered = False
+        if previous_grid:
+            self.previous_grid = previous_grid
+        self.current_grid = file
+        self.watch_cells()
+
+    def watched_file(self, record):
+        # file on disk a record is drawn from, for nested
+        # grids the png saved with the linked grid
+        if record.kwargs.get("link_to"):
+            return os.path.splitext(record.kwargs["link_to"])[0] + ".png"
+        if record.kwargs.get("source_type") == "file":
+            return record.kwargs["source"]
+        return None
+
+    def watch_cells(self):
+        if self.watcher is None:
+            return
+        files = set()
+        for record in self.grid.records:
+            file = self.watched_file(record)
+            if file is not None:
+                files.add(file)
+        self.watcher.watch(files)
+
+    def files_changed(self, files):
+        # called on the watcher thread
+        Clock.schedule_once(lambda dt: self.reload_cells(files))
+
+    def reload_cells(self, files):
+        # reload the shown cells drawn from files, cells
+        # without a widget read their file when shown
+        files = set(os.path.abspath(file) for file in files)
+        for record in self.grid.records:
+            file = self.watched_file(record)
+            if file is None or os.path.abspath(file) not in files:
+                continue
+            if record.widget is None or not os.path.isfile(file):
+                continue
+            try:
+                with stats.timer("cell_reload"):
+                    if record.kwargs.get("link_to") and record.kwargs["source"] != file:
+                        # the linked grid had no png when shown,
+                        # look up the thumbnail again
+                        record.kwargs["source"] = None
+                        self.grid.replace_cell(record)
+                    else:
+                        record.loaded = time.time_ns()
+                        record.widget.reload()
+            except Exception as ex:
+                print(ex)
+
+    def release_records(self, cached):
+        records, _ = cached
+        for record in records:
+            record.hide()
 
     def app_exit(self):
-        self.grid_thumbnail()
-        self.grid_save()
+        # compact any journal into the xml
+        self.grid_save(rewrite=True)
         App.get_running_app().stop()
 
+    def on_stop(self):
+        # write out any pending saves before exiting
+        self.save_worker.stop()
+        self.decode_pool.shutdown()
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.hasher.close()
+        if self.catalog is not None:
+            self.catalog.close()
+        if stats.enabled:
+            print(stats.summary())
+            stats.close()
+
+    def stats_refresh(self, dt):
+        # only redraw histograms while they are shown
+        if self.root.current_tab is self.stats_tab:
+            self.stats_view.refresh()
+
+    def build_bindings(self, root, tab):
+        if tab.tab_name != "bindings":
+            return
+        root.unbind(current_tab=self.build_bindings)
+        bindings_container = BoxLayout(orientation="vertical", size_hint_y=None)
+
+        actions = 0
+        for domain, domain_actions in self.actions.items():
+            bindings_container.add_widget(Label(text=str(domain), height=40))
+            for action, action_bindings in domain_actions.items():
+                binding_widget = BindingItem(
+                    domain, action, action_bindings, self.actions, height=40
+                )
+                bindings_container.add_widget(binding_widget)
+                actions += 1
+        # set height for scrollview
+        bindings_container.height = actions * 40
+        self.bindings_scroll.add_widget(bindings_container)
+
+    def first_frame(self, *args):
+        # time from arguments being parsed to the first
+        # frame, see benchmarks/startup.py
+        Window.unbind(on_flip=self.first_frame)
+        stats.record("first_frame", time.perf_counter() - stats.started)
+        stats.flush()
+
     def center_cells(self, widget):
-        for child in widget.content.children:
+        for child in self.grid.cell_widgets():
             child.jump(override_above=True)
 
+    def page_up(self):
+        # only virtual grids scroll
+        try:
+            self.grid.page(-1)
+        except AttributeError:
+            pass
+
+    def page_down(self):
+        try:
+            self.grid.page(1)
+        except AttributeError:
+            pass
+
     def build(self):
         root = TabbedPanel(do_default_tab=False)
         self.root = root
@@ -739,176 +1983,107 @@ class GridApp(App):
         tab.tab_name = "grid"
         # testing grid 2x2 with some
         # filler content
-        # could wrap in scrollview too...
-        rows = math.ceil(len(self.files) / 2)
-        cols = math.ceil(len(self.files) / 2)
-        # if only two items, grid will split
-        # with rows or columns first
-        if len(self.files) == 2:
-            cols += 1
-
-        g = BgGridLayout(rows=rows, cols=cols)
+        if self.virtual:
+            # large grids only create widgets for visible cells
+            g = VirtualGrid()
+            tab.sub_content.append(g.layout)
+        else:
+            g = BgGridLayout()
+        g.layout_cells(len(self.files))
         self.grid = g
+        # adding, removing or reordering cells rewrites the
+        # full xml instead of journaling
+        self.grid_reordered = True
+        g.bind(children=self.mark_reordered)
+        # cells move under a still pointer when the
+        # grid changes or scrolls
+        g.bind(children=self.hover, size=self.hover, pos=self.hover)
+        if self.virtual:
+            g.bind(scroll_y=self.hover)
+            g.layout.bind(children=self.hover)
+        Window.bind(mouse_pos=self.hover)
+        records = []
         for file in self.files:
             if file.endswith(".xml") and len(self.files) == 1:
                 self.grid_load(file)
             elif file.endswith(".xml") and len(self.files) > 1:
-                tree = etree.parse(file)
-                file_root = tree.getroot()
-                thumbnail = None
-                for element in file_root.iter("grid"):
-                    if isinstance(element.tag, str):
-                        # try to use
-                        try:
-                            thumbnail = str(
-                                pathlib.PurePath(
-                                    self.data_dir, element.attrib["thumbnail"]
-                                )
-                            )
-                            source_type = "file"
-                        except Exception as ex:
-                            # generate a thumbnail representation with PIL
-                            thumbnail = grid_representation_img(file_root)
-                            source_type = "bytes"
-                # self.grid_load(file)
-                # check if grid
-                # if grid try to get thumbnail
-                if thumbnail:
-                    self.grid.add_widget(
-                        ImgPixel(
-                            source=thumbnail,
-                            source_type=source_type,
-                            link_to=file,
-                            app=self,
-                        )
-                    )
-                else:
-                    self.grid.add_widget(
-                        TxtPixel(source=file, source_type="file", app=self)
+                # the thumbnail is looked up when the cell is shown
+                records.append(
+                    CellRecord(
+                        ImgPixel, source=None, source_type=None, link_to=file, app=self
                     )
-            elif (
-                file.lower().endswith(".png")
-                or file.lower().endswith(".jpg")
-                or file.lower().endswith(".jpeg")
-                or file.lower().endswith(".gif")
-            ):
-                self.grid.add_widget(
-                    ImgPixel(source=file, source_type="file", app=self)
+                )
+            elif file.lower().endswith(image_extensions):
+                records.append(
+                    CellRecord(ImgPixel, source=file, source_type="file", app=self)
                 )
             else:
-                self.grid.add_widget(
-                    TxtPixel(source=file, source_type="file", app=self)
+                records.append(
+                    CellRecord(TxtPixel, source=file, source_type="file", app=self)
                 )
+        self.prefetch_shared(records)
+        for record in records:
+            self.grid.add_cell(record)
 
         tab.add_widget(g)
         root.add_widget(tab)
+        self.watch_tab(tab)
         self.current_grid = self.grid_save()
+        self.watch_cells()
 
         Clock.schedule_once(lambda x, tab=tab: self.center_cells(tab), 1)
+        # fill in cells as their images finish decoding
+        Clock.schedule_interval(lambda dt: self.decode_pool.finish(), 0)
+        # grid_save only snapshots on the main thread and
+        # leaves the slower work to the save worker
         Clock.schedule_interval(lambda dt: self.grid_save(), self.save_interval)
 
-        bindings_container = BoxLayout(orientation="vertical", size_hint_y=None)
-
-        actions = 0
-        for domain, domain_actions in self.actions.items():
-            bindings_container.add_widget(Label(text=str(domain), height=40))
-            for action, action_bindings in domain_actions.items():
-                binding_widget = BindingItem(
-                    domain, action, action_bindings, self.actions, height=40
-                )
-                bindings_container.add_widget(binding_widget)
-                actions += 1
-        # set height for scrollview
-        bindings_container.height = actions * 40
+        # widgets for editing bindings are built when the
+        # tab is first selected, see build_bindings
         bindings_scroll = ScrollView(bar_width=20)
-        bindings_scroll.add_widget(bindings_container)
+        self.bindings_scroll = bindings_scroll
+        root.bind(current_tab=self.build_bindings)
 
         tab = TabItem(text="bindings", root=root)
         tab.tab_name = "bindings"
         tab.add_widget(bindings_scroll)
         root.add_widget(tab)
+        self.watch_tab(tab)
+
+        if stats.enabled:
+            stats_view = StatsView()
+            stats_scroll = ScrollView(bar_width=20)
+            stats_scroll.add_widget(stats_view)
+            tab = TabItem(text="stats", root=root)
+            tab.tab_name = "stats"
+            tab.add_widget(stats_scroll)
+            root.add_widget(tab)
+            self.watch_tab(tab)
+            Window.bind(on_flip=self.first_frame)
+            # frame time is the interval between clock ticks
+            Clock.schedule_interval(lambda dt: stats.record("frame", dt), 0)
+            self.stats_tab = tab
+            self.stats_view = stats_view
+            Clock.schedule_interval(self.stats_refresh, 1)
 
         return root
 
 
-def source_text(source=None, source_type=None):
-    contents = ""
-    if source_type == "file" and os.path.isfile(source):
-        try:
-            with open(source, "r") as f:
-                contents = f.read()
-        except TypeError:
-            pass
-
-    return contents
-
-
-def grid_representation_img(grid_xml):
-    cells = []
-    img_cell_width = 200
-    img_cell_height = 200
-    img_background_color = (0, 0, 0, 255)
-
-    for grid in grid_xml.iter("grid"):
-        for cell in grid.iter("cell"):
-            cells.append(cell.attrib["source"])
-    # generate a thumbnail image...
-    img_rows = math.ceil(len(cells) / 2)
-    img_cols = math.ceil(len(cells) / 2)
-    img_width = img_cols * img_cell_width
-    img_height = img_rows * img_cell_height
-
-    representation_img = PILImage.new(
-        "RGB", (img_width, img_height), img_background_color
-    )
-    draw = ImageDraw.Draw(representation_img, "RGBA")
-    x = 0
-    y = 0
-    # row = 0
-    col = 0
-    for cell in cells:
-        draw.rectangle(
-            [x, y, x + img_cell_width, y + img_cell_height],
-            outline=(255, 255, 255, 255),
-        )
-        draw.text(
-            (x + int(img_cell_width / 4), y + int(img_cell_height / 2)), str(cell)
-        )
-        col += 1
-        if col > img_cols:
-            y += img_cell_width
-            x = 0
-            col = 0
-        else:
-            x += img_cell_width
-    # representation_img.show()
-
-    file = io.BytesIO()
-    extension = "JPEG"
-    representation_img.save(file, extension)
-    representation_img.close()
-    file.seek(0)
-
-    return file
+def pixels_texture(width, height, pixels):
+    # create a texture from rgba pixels ordered top to bottom
+    with stats.timer("texture_upload"):
+        texture = Texture.create(size=(width, height), colorfmt="rgba")
+        texture.blit_buffer(pixels, colorfmt="rgba", bufferfmt="ubyte")
+        texture.flip_vertical()
+        return texture
 
 
-def main():
+def main(argv=None):
     files = []
-    parser = argparse.ArgumentParser()
-    parser.add_argument("files", nargs="+")
-    parser.add_argument(
-        "--use-db", action="store_true", help="save grids to db in a machinic format"
-    )
-    parser.add_argument(
-        "--unique-session",
-        action="store_true",
-        help="assign db grids a unique uuid instead of grid hash",
-    )
-    parser.add_argument("--db-host", default="127.0.0.1", help="db host ip")
-    parser.add_argument("--db-port", default="6379", type=int, help="db port")
-
-    args = parser.parse_args()
+    args = cli.grid_parser().parse_args(argv)
     files.extend(args.files)
+    if args.stats:
+        stats.enable(args.stats)
 
     app = GridApp(**vars(args))
     app.run()
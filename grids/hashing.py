@@ -0,0 +1,152 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import hashlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# content hashes of cell sources so a file can be recognized
+# after it moves, stored in the grid xml as filehash
+#
+# files are hashed in fixed size chunks on a pool of threads,
+# hashlib releases the gil while hashing, and the filehash is
+# the sha1 of the chunk digests. hashes are cached on path,
+# size, mtime and inode so unchanged files are not read again
+
+schema = """
+create table if not exists hashes (
+    path text primary key,
+    size integer not null,
+    mtime_ns integer not null,
+    inode integer not null,
+    hash text not null
+);
+create index if not exists hashes_hash on hashes (hash);
+"""
+
+
+class ContentHasher(object):
+    def __init__(self, cache_path, chunk_size=8 * 1024 * 1024, workers=None):
+        self.chunk_size = chunk_size
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+        # whole files hashed by hash_later, kept apart from
+        # executor since hash waits on chunks run there
+        self.background = ThreadPoolExecutor(max_workers=1)
+        # paths submitted to background and not yet hashed
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(cache_path), check_same_thread=False)
+        self.conn.execute("pragma journal_mode=wal")
+        self.conn.executescript(schema)
+
+    def cached(self, path, stat):
+        with self.lock:
+            row = self.conn.execute(
+                "select size, mtime_ns, inode, hash from hashes where path = ?",
+                (path,),
+            ).fetchone()
+        if row is not None and tuple(row[:3]) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+            stat.st_ino,
+        ):
+            return row[3]
+        return None
+
+    def known(self, path):
+        # cached filehash of path or None, without reading it
+        path = os.path.abspath(path)
+        return self.cached(path, os.stat(path))
+
+    def hash_later(self, path):
+        # hash path in the background so a later call of
+        # known finds it
+        path = os.path.abspath(path)
+        with self.lock:
+            if path in self.pending:
+                return
+            self.pending.add(path)
+        self.background.submit(self.hash_pending, path)
+
+    def hash_pending(self, path):
+        try:
+            self.hash(path)
+        except OSError as ex:
+            print(ex)
+        finally:
+            with self.lock:
+                self.pending.discard(path)
+
+    def hash_chunk(self, fd, offset):
+        return hashlib.sha1(os.pread(fd, self.chunk_size, offset)).digest()
+
+    def hash(self, path):
+        # filehash of path, read only if changed since cached
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        filehash = self.cached(path, stat)
+        if filehash is not None:
+            return filehash
+
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            offsets = range(0, max(1, stat.st_size), self.chunk_size)
+            digests = self.executor.map(lambda o: self.hash_chunk(fd, o), offsets)
+            filehash = hashlib.sha1(b"".join(digests)).hexdigest()
+        finally:
+            os.close(fd)
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "insert or replace into hashes values (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, stat.st_ino, filehash),
+            )
+        return filehash
+
+    def locate(self, filehash, search_dirs=()):
+        # an existing file with filehash, first from files
+        # hashed before and then from files in search_dirs
+        # the same size as a file known to have filehash
+        with self.lock:
+            rows = self.conn.execute(
+                "select path, size from hashes where hash = ?", (filehash,)
+            ).fetchall()
+        for path, _ in rows:
+            try:
+                if self.hash(path) == filehash:
+                    return path
+            except OSError:
+                pass
+
+        # only files the same size are hashed, without a
+        # known size the search would read every file
+        sizes = set(size for _, size in rows)
+        if not sizes:
+            return None
+        for search_dir in search_dirs:
+            try:
+                entries = list(os.scandir(search_dir))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if not entry.is_file():
+                        continue
+                    if entry.stat().st_size not in sizes:
+                        continue
+                    if self.hash(entry.path) == filehash:
+                        return entry.path
+                except OSError:
+                    pass
+        return None
+
+    def close(self):
+        self.background.shutdown(wait=False, cancel_futures=True)
+        self.executor.shutdown(wait=False)
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,296 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import pathlib
+import time
+import uuid
+from PIL import Image as PILImage
+from xdg import XDG_CACHE_HOME, XDG_DATA_HOME
+from lxml import etree
+from grids import db, render, state
+from grids.cache import TextureCache
+
+# walks the grids data directory without a window and brings
+# every grid up to date: xml is validated, missing or stale
+# pngs are rendered again and thumbnails whose hash changed
+# are pushed to the db
+#
+# results are appended to a json lines file in the cache dir
+# as grids finish, an interrupted run picks up where it left
+# off and grids unchanged since they were recorded are skipped
+
+
+def grid_signature(file):
+    # a changed signature means the grid needs maintaining
+    return state.file_signature([file, png_file(file), state.journal_file(file)])
+
+
+def png_file(file):
+    return os.path.splitext(file)[0] + ".png"
+
+
+def validate(file):
+    # returns an error string or None
+    try:
+        file_root = etree.parse(file).getroot()
+    except (OSError, etree.XMLSyntaxError) as ex:
+        return str(ex)
+    if file_root.tag != "grid":
+        return "root element is {} not grid".format(file_root.tag)
+    positions = set()
+    for element in file_root.iter("cell"):
+        if not isinstance(element.tag, str):
+            continue
+        for attribute in ["source", "position"]:
+            if attribute not in element.attrib:
+                return "cell missing {}".format(attribute)
+        try:
+            positions.add(int(element.attrib["position"]))
+        except ValueError:
+            return "cell position {} is not a number".format(element.attrib["position"])
+    if positions != set(range(len(positions))):
+        return "cell positions are not 0 to {}".format(len(positions) - 1)
+    header = file_root.find("header")
+    if header is not None and header.get("cells") != str(len(positions)):
+        return "header has {} cells not {}".format(header.get("cells"), len(positions))
+    return None
+
+
+def is_stale(file):
+    # the png is missing, unreadable or older than the xml
+    # or its journal. grid_write sets the png mtime after
+    # each save the png shows, so only changes made since
+    # the last save make it stale
+    png = png_file(file)
+    try:
+        png_mtime = os.stat(png).st_mtime_ns
+    except OSError:
+        return True
+    for path in [file, state.journal_file(file)]:
+        try:
+            if os.stat(path).st_mtime_ns > png_mtime:
+                return True
+        except OSError:
+            pass
+    try:
+        with PILImage.open(png) as img:
+            img.verify()
+    except Exception:
+        return True
+    return False
+
+
+def maintain_grid(job):
+    # called in a pool process, returns a result dict
+    file, data_dir = job
+    result = {"file": file, "status": "ok", "hash": None}
+    error = validate(file)
+    if error is not None:
+        result["status"] = "invalid"
+        result["error"] = error
+        result["signature"] = grid_signature(file)
+        return result
+
+    png = png_file(file)
+    try:
+        if is_stale(file):
+            cache_dir = pathlib.PurePath(XDG_CACHE_HOME, "grids")
+            img = render.render_grid(
+                file,
+                data_dir=data_dir,
+                cache=TextureCache(pathlib.PurePath(cache_dir, "textures")),
+                representations=render.RepresentationCache(
+                    pathlib.PurePath(cache_dir, "representations")
+                ),
+            )
+            # write then rename so other readers never
+            # see a partially written png
+            tmp_png = "{}.{}.tmp".format(png, os.getpid())
+            img.save(tmp_png, "PNG")
+            img.close()
+            os.replace(tmp_png, png)
+            result["status"] = "rendered"
+        with open(png, "rb") as f:
+            result["hash"] = hashlib.sha1(f.read()).hexdigest()
+    except Exception as ex:
+        result["status"] = "failed"
+        result["error"] = str(ex)
+    result["signature"] = grid_signature(file)
+    return result
+
+
+def load_progress(progress_file):
+    # latest recorded result for each grid
+    progress = {}
+    try:
+        with open(progress_file, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # partially written line from an interruption
+                    continue
+                progress[entry["file"]] = entry
+    except FileNotFoundError:
+        pass
+    return progress
+
+
+def compact_progress(progress_file, progress):
+    tmp_file = "{}.tmp".format(progress_file)
+    with open(tmp_file, "w") as f:
+        for entry in progress.values():
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    os.replace(tmp_file, progress_file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="gg maintain",
+        description="validate, render and push every grid in the data directory",
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=str(pathlib.PurePath(XDG_DATA_HOME, "grids")),
+        help="directory of grid xml and png files",
+    )
+    parser.add_argument(
+        "--processes", type=int, default=os.cpu_count(), help="worker processes"
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="ignore progress recorded by previous runs",
+    )
+    parser.add_argument(
+        "--use-db", action="store_true", help="push changed thumbnails to db"
+    )
+    parser.add_argument(
+        "--unique-session",
+        action="store_true",
+        help="assign db grids a unique uuid instead of grid hash",
+    )
+    parser.add_argument("--db-host", default="127.0.0.1", help="db host ip")
+    parser.add_argument("--db-port", default="6379", type=int, help="db port")
+    parser.add_argument(
+        "--db-batch",
+        default=64,
+        type=int,
+        help="thumbnails pushed to the db in each pipeline",
+    )
+    args = parser.parse_args(argv)
+
+    cache_dir = pathlib.PurePath(XDG_CACHE_HOME, "grids")
+    os.makedirs(str(cache_dir), exist_ok=True)
+    progress_file = str(pathlib.PurePath(cache_dir, "maintain.jsonl"))
+    progress = {} if args.restart else load_progress(progress_file)
+
+    session_uuid = None
+    if args.unique_session:
+        session_uuid = str(uuid.uuid4())
+    if args.use_db:
+        db_conn = db.connect(args.db_host, args.db_port)
+
+    # grids changed since they were recorded, or
+    # recorded before a db push could be made
+    files = sorted(
+        entry.path
+        for entry in os.scandir(args.data_dir)
+        if entry.name.endswith(".xml") and entry.is_file()
+    )
+    jobs = []
+    for file in files:
+        entry = progress.get(file)
+        if (
+            entry is not None
+            and entry["signature"] == grid_signature(file)
+            and (entry.get("pushed") or not args.use_db or entry["hash"] is None)
+        ):
+            continue
+        jobs.append((file, args.data_dir))
+    print(
+        "{} grids, {} up to date, {} to maintain".format(
+            len(files), len(files) - len(jobs), len(jobs)
+        )
+    )
+
+    counts = {"ok": 0, "rendered": 0, "invalid": 0, "failed": 0, "pushed": 0}
+    start = time.perf_counter()
+    last_report = start
+    # results waiting to be pushed to the db in one pipeline
+    pending = []
+    pool = multiprocessing.Pool(args.processes)
+    with open(progress_file, "a") as f:
+
+        def record(results):
+            for result in results:
+                progress[result["file"]] = result
+                f.write(json.dumps(result, separators=(",", ":")) + "\n")
+            f.flush()
+
+        def push():
+            try:
+                grids = []
+                for result in pending:
+                    with open(png_file(result["file"]), "rb") as png:
+                        grids.append(
+                            (
+                                png.read(),
+                                os.path.splitext(os.path.basename(result["file"]))[0],
+                            )
+                        )
+                db.save_many(db_conn, grids, session_uuid)
+                for result in pending:
+                    result["pushed"] = True
+                counts["pushed"] += len(pending)
+            except Exception as ex:
+                print(ex)
+            record(pending)
+            pending.clear()
+
+        try:
+            results = pool.imap_unordered(maintain_grid, jobs, chunksize=4)
+            for done, result in enumerate(results, 1):
+                file = result["file"]
+                counts[result["status"]] += 1
+                if "error" in result:
+                    print("{}: {}".format(file, result["error"]))
+
+                previous = progress.get(file, {})
+                result["pushed"] = previous.get("pushed", False)
+                if result["hash"] != previous.get("hash"):
+                    result["pushed"] = False
+                if args.use_db and result["hash"] and not result["pushed"]:
+                    pending.append(result)
+                    if len(pending) >= args.db_batch:
+                        push()
+                else:
+                    record([result])
+
+                now = time.perf_counter()
+                if now - last_report >= 1 or done == len(jobs):
+                    if pending:
+                        push()
+                    last_report = now
+                    print(
+                        "{}/{} grids, {:.1f} grids/s, {}".format(
+                            done,
+                            len(jobs),
+                            done / max(now - start, 1e-9),
+                            ", ".join(
+                                "{} {}".format(count, status)
+                                for status, count in counts.items()
+                            ),
+                        )
+                    )
+        finally:
+            pool.terminate()
+    compact_progress(progress_file, progress)
@@ -0,0 +1,420 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import argparse
+import bisect
+import hashlib
+import io
+import math
+import multiprocessing
+import os
+import pathlib
+import threading
+import time
+from PIL import Image as PILImage, ImageDraw, ImageFont
+from xdg import XDG_CACHE_HOME, XDG_DATA_HOME
+from lxml import etree
+from grids import state
+from grids.cache import LRUCache, TextureCache
+from grids.text import TextSource
+
+# renders grid xml to an image without kivy, matching
+# the layout GridApp uses for a grid and its cells
+
+# size of the grid widget in a default 800x600 window
+default_size = (800, 554)
+# side of the container a cell scrolls over at zoom 1
+container_size = 4000
+background_color = (38, 38, 38, 255)
+text_color = (255, 255, 255, 255)
+default_font_size = 15
+image_extensions = (".png", ".jpg", ".jpeg", ".gif", ".tif", ".tiff")
+# size of each cell in a grid representation
+representation_cell_size = (200, 200)
+
+
+def grid_cells(file):
+    # cell attributes ordered by position
+    cells = state.load_cells(file)
+    cells.sort(key=lambda cell: int(cell.get("position", 0)))
+    return cells
+
+
+def grid_size(header, data_dir):
+    if header["width"] is not None and header["height"] is not None:
+        return header["width"], header["height"]
+    # size of a previously saved thumbnail
+    try:
+        thumbnail = pathlib.PurePath(data_dir, header["thumbnail"])
+        with PILImage.open(str(thumbnail)) as img:
+            return img.size
+    except (TypeError, OSError):
+        return default_size
+
+
+def viewport(cell, cell_size, content_size):
+    # visible box of the content in a scrollview of cell_size,
+    # measured from the top left of the content
+    cell_width, cell_height = cell_size
+    content_width, content_height = content_size
+    scroll_x = float(cell.get("scroll_x", 0))
+    scroll_y = float(cell.get("scroll_y", 1))
+    left = scroll_x * max(0, content_width - cell_width)
+    top = (1 - scroll_y) * max(0, content_height - cell_height)
+    return left, top, left + cell_width, top + cell_height
+
+
+def render_image(source, cell, cell_size, cache):
+    zoom = float(cell.get("zoom", 1))
+    content_size = container_size * zoom
+    if cache is not None and isinstance(source, str):
+        # same downscaled pixels the grid uses for the texture
+        width, height, pixels = cache.load(source, content_size)
+        img = PILImage.frombuffer("RGBA", (width, height), pixels, "raw", "RGBA", 0, 1)
+    else:
+        img = PILImage.open(source).convert("RGBA")
+
+    # the image is stretched over the container, so map the
+    # visible part of the container back to image pixels
+    left, top, right, bottom = viewport(cell, cell_size, (content_size, content_size))
+    scale_x = img.width / content_size
+    scale_y = img.height / content_size
+    box = (
+        min(img.width, left * scale_x),
+        min(img.height, top * scale_y),
+        min(img.width, right * scale_x),
+        min(img.height, bottom * scale_y),
+    )
+    visible_size = (
+        max(1, round((box[2] - box[0]) / scale_x)),
+        max(1, round((box[3] - box[1]) / scale_y)),
+    )
+    if box[2] <= box[0] or box[3] <= box[1]:
+        return None
+    return img.resize(visible_size, PILImage.BILINEAR, box=box)
+
+
+def load_font(font_size):
+    try:
+        return ImageFont.load_default(size=font_size)
+    except TypeError:
+        # older pillow without scalable default font
+        return ImageFont.load_default()
+
+
+def render_text(source, cell, cell_size):
+    font_size = float(cell.get("font_size", default_font_size))
+    line_height = max(1, round(font_size * 1.2))
+    text_source = TextSource(source)
+    content_height = max(container_size, text_source.line_count() * line_height)
+    left, top, right, bottom = viewport(
+        cell, cell_size, (container_size, content_height)
+    )
+    img = PILImage.new("RGBA", cell_size, background_color)
+    draw = ImageDraw.Draw(img)
+    font = load_font(round(font_size))
+    # only lines inside the viewport
+    first = int(top // line_height)
+    count = int(math.ceil(cell_size[1] / line_height)) + 1
+    char_widths = {}
+    for i, line in enumerate(text_source.lines(first, count)):
+        visible = visible_text(line, font, left, cell_size[0], char_widths)
+        if visible is None:
+            continue
+        x, line = visible
+        y = (first + i) * line_height - top
+        draw.text((x, y), line, font=font, fill=text_color)
+    text_source.close()
+    return img
+
+
+def visible_text(line, font, left, width, char_widths):
+    # the part of a line drawn at -left that falls inside
+    # width and where to draw it, None if nothing is visible.
+    # drawing only this part keeps font rendering of lines
+    # scrolled out of view from dominating render time,
+    # character widths are cached in char_widths since
+    # measuring whole lines costs about as much as drawing
+    if not line:
+        return None
+    ends = []
+    end = 0
+    for character in line:
+        if character not in char_widths:
+            char_widths[character] = font.getlength(character)
+        end += char_widths[character]
+        ends.append(end)
+    if end <= left:
+        return None
+    # first character ending past left and the first ending
+    # at or past the right edge
+    start = bisect.bisect_right(ends, left)
+    stop = bisect.bisect_left(ends, left + width, start) + 1
+    x = (ends[start - 1] if start else 0) - left
+    return x, line[start:stop]
+
+
+def render_cell(cell, cell_size, data_dir, cache, representations=None):
+    source = cell["source"]
+    if source.endswith(".xml"):
+        # nested grid, use its thumbnail or a representation
+        thumbnail = str(pathlib.PurePath(data_dir, source.replace(".xml", ".png")))
+        if os.path.isfile(thumbnail):
+            return render_image(thumbnail, cell, cell_size, cache)
+        elif os.path.isfile(source):
+            if representations is None:
+                representation = grid_representation_img(etree.parse(source).getroot())
+            else:
+                representation = representations.load(source)
+            return render_image(representation, cell, cell_size, None)
+        return None
+    elif source.lower().endswith(image_extensions):
+        return render_image(source, cell, cell_size, cache)
+    return render_text(source, cell, cell_size)
+
+
+def render_grid(file, data_dir=None, cache=None, size=None, representations=None):
+    # compose the visual state of a grid xml as a PIL image
+    if data_dir is None:
+        data_dir = pathlib.PurePath(XDG_DATA_HOME, "grids")
+    header = state.read_header(file)
+    cells = grid_cells(file)
+    if size is None:
+        size = grid_size(header, data_dir)
+    width, height = size
+    rows, cols = state.grid_layout(len(cells))
+
+    grid_img = PILImage.new("RGBA", (width, height), background_color)
+    # widgets fill the grid left to right, top to bottom in the
+    # order they were added, the reverse of their position
+    for index, cell in enumerate(reversed(cells)):
+        row, col = divmod(index, cols)
+        x0 = round(col * width / cols)
+        x1 = round((col + 1) * width / cols)
+        y0 = round(row * height / rows)
+        y1 = round((row + 1) * height / rows)
+        try:
+            cell_img = render_cell(
+                cell, (x1 - x0, y1 - y0), data_dir, cache, representations
+            )
+        except Exception as ex:
+            print(ex)
+            continue
+        if cell_img is not None:
+            grid_img.paste(cell_img, (x0, y0), cell_img)
+    return grid_img
+
+
+def render_to_file(job):
+    file, output, size = job
+    try:
+        cache_dir = pathlib.PurePath(XDG_CACHE_HOME, "grids")
+        cache = TextureCache(pathlib.PurePath(cache_dir, "textures"))
+        representations = RepresentationCache(
+            pathlib.PurePath(cache_dir, "representations")
+        )
+        img = render_grid(file, cache=cache, size=size, representations=representations)
+        if output.lower().endswith((".jpg", ".jpeg")):
+            img = img.convert("RGB")
+        img.save(output)
+        return output
+    except Exception as ex:
+        print("{}: {}".format(file, ex))
+
+
+def grid_representation_img(grid_xml):
+    cells = []
+    img_cell_width, img_cell_height = representation_cell_size
+    img_background_color = (0, 0, 0, 255)
+
+    for grid in grid_xml.iter("grid"):
+        for cell in grid.iter("cell"):
+            cells.append(cell.attrib["source"])
+    # generate a thumbnail image...
+    img_rows = math.ceil(len(cells) / 2)
+    img_cols = math.ceil(len(cells) / 2)
+    img_width = img_cols * img_cell_width
+    img_height = img_rows * img_cell_height
+
+    representation_img = PILImage.new(
+        "RGB", (img_width, img_height), img_background_color
+    )
+    draw = ImageDraw.Draw(representation_img, "RGBA")
+    x = 0
+    y = 0
+    # row = 0
+    col = 0
+    for cell in cells:
+        draw.rectangle(
+            [x, y, x + img_cell_width, y + img_cell_height],
+            outline=(255, 255, 255, 255),
+        )
+        draw.text(
+            (x + int(img_cell_width / 4), y + int(img_cell_height / 2)), str(cell)
+        )
+        col += 1
+        if col > img_cols:
+            y += img_cell_width
+            x = 0
+            col = 0
+        else:
+            x += img_cell_width
+    # representation_img.show()
+
+    file = io.BytesIO()
+    extension = "JPEG"
+    representation_img.save(file, extension)
+    representation_img.close()
+    file.seek(0)
+
+    return file
+
+
+class RepresentationCache(object):
+    # grid_representation_img jpegs of nested grids without
+    # a thumbnail, kept in memory and on disk
+    #
+    # entries are keyed on a hash of the cell sources and
+    # layout the representation is drawn from, so a changed
+    # child grid gets a new entry and identical children
+    # share one. parsed keys are remembered by the path,
+    # size and mtime of the xml
+    #
+    # with a db.SharedCache as shared, entries missing on
+    # disk are looked up there and new entries stored there
+    def __init__(self, cache_dir, max_bytes=64 * 1024 * 1024):
+        self.cache_dir = str(cache_dir)
+        self.images = LRUCache(max_bytes, max_entries=4096)
+        self.keys = {}
+        self.shared = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def entry_file(self, key):
+        return os.path.join(self.cache_dir, "{}.jpg".format(key))
+
+    def write_entry(self, entry, contents):
+        tmp_entry = "{}.{}.{}.tmp".format(entry, os.getpid(), threading.get_ident())
+        try:
+            with open(tmp_entry, "wb") as f:
+                f.write(contents)
+            os.replace(tmp_entry, entry)
+        except OSError as ex:
+            print(ex)
+
+    def key(self, file):
+        stat = os.stat(file)
+        file_key = (os.path.abspath(file), stat.st_size, stat.st_mtime_ns)
+        if file_key not in self.keys:
+            sources = [cell["source"] for cell in state.read_cells(file)]
+            layout = "{}x{}".format(*representation_cell_size)
+            self.keys[file_key] = hashlib.sha1(
+                "\n".join([layout] + sources).encode()
+            ).hexdigest()
+        return self.keys[file_key]
+
+    def load(self, file):
+        # returns a BytesIO of the representation jpeg
+        key = self.key(file)
+        contents = self.images.get(key)
+        if contents is None:
+            entry = self.entry_file(key)
+            try:
+                with open(entry, "rb") as f:
+                    contents = f.read()
+            except OSError:
+                if self.shared is not None:
+                    contents = self.shared.get(self.shared.representation_key(key))
+                if contents is None:
+                    representation = grid_representation_img(
+                        etree.parse(file).getroot()
+                    )
+                    contents = representation.getvalue()
+                    if self.shared is not None:
+                        threading.Thread(
+                            target=self.shared.put,
+                            args=(self.shared.representation_key(key), contents),
+                            daemon=True,
+                        ).start()
+                self.write_entry(entry, contents)
+            self.images.put(key, contents, len(contents))
+        return io.BytesIO(contents)
+
+    def prefetch(self, files):
+        # fetch entries of files missing on disk from the
+        # shared cache, with one lookup for each batch
+        if self.shared is None:
+            return
+        missing = []
+        for file in files:
+            try:
+                key = self.key(file)
+            except Exception as ex:
+                print(ex)
+                continue
+            if key not in self.images.entries and not os.path.exists(
+                self.entry_file(key)
+            ):
+                missing.append(key)
+        keys = [self.shared.representation_key(key) for key in missing]
+        for key, contents in zip(missing, self.shared.get_many(keys)):
+            if contents is not None:
+                self.write_entry(self.entry_file(key), contents)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="gg render", description="render grid xml to images without a window"
+    )
+    parser.add_argument("files", nargs="+", help="grid xml files")
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="output image for a single grid, or directory for several",
+    )
+    parser.add_argument("--width", type=int, help="grid width in pixels")
+    parser.add_argument("--height", type=int, help="grid height in pixels")
+    parser.add_argument(
+        "--processes", type=int, default=os.cpu_count(), help="render processes"
+    )
+    args = parser.parse_args(argv)
+
+    size = None
+    if args.width and args.height:
+        size = (args.width, args.height)
+
+    jobs = []
+    for file in args.files:
+        name = "{}.png".format(os.path.splitext(os.path.basename(file))[0])
+        if args.output is None:
+            output = os.path.join(os.path.dirname(os.path.abspath(file)), name)
+        elif len(args.files) == 1 and not os.path.isdir(args.output):
+            output = args.output
+        else:
+            os.makedirs(args.output, exist_ok=True)
+            output = os.path.join(args.output, name)
+        jobs.append((os.path.abspath(file), output, size))
+
+    start = time.perf_counter()
+    pool = None
+    if len(jobs) == 1 or args.processes == 1:
+        results = map(render_to_file, jobs)
+    else:
+        pool = multiprocessing.Pool(args.processes)
+        results = pool.imap_unordered(render_to_file, jobs, chunksize=8)
+    try:
+        for output in results:
+            if output:
+                print("grid rendered: {}".format(output))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    elapsed = time.perf_counter() - start
+    print(
+        "{} grids in {:.2f}s ({:.1f} grids/s)".format(
+            len(jobs), elapsed, len(jobs) / max(elapsed, 1e-9)
+        )
+    )
@@ -0,0 +1,202 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import json
+import math
+import os
+
+# lxml is imported by the functions that read or write
+# xml, the journal and signatures do not need it
+
+# grid xml written with a header element before the cells,
+# files without one are version 1
+grid_version = 2
+
+# cell attributes that change while a grid is open and
+# are recorded in the journal instead of rewriting the xml
+journaled_attributes = ["scroll_x", "scroll_y", "zoom", "font_size"]
+
+
+def journal_file(file):
+    return os.path.splitext(file)[0] + ".journal"
+
+
+def file_signature(paths):
+    # sizes and mtimes of files, None for missing files
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append([stat.st_size, stat.st_mtime_ns])
+        except OSError:
+            signature.append(None)
+    return signature
+
+
+def grid_layout(count):
+    # rows and cols a BgGridLayout lays out, the cols set by
+    # layout_cells and only the rows the cells fill
+    cols = math.ceil(count / 2)
+    if count == 2:
+        cols += 1
+    cols = max(cols, 1)
+    return max(math.ceil(count / cols), 1), cols
+
+
+def write_grid(file, thumbnail, cells, size=None):
+    # write the full grid xml, cells are dicts of attributes
+    # and size is the size of the grid thumbnail
+    #
+    # the header repeats the grid attributes with the cell
+    # count and layout so they can be read without reading
+    # the cells, the grid attributes are kept for older readers
+    from lxml import etree
+
+    root = etree.Element("grid")
+    header = etree.SubElement(root, "header")
+    header.set("version", str(grid_version))
+    header.set("thumbnail", thumbnail)
+    header.set("cells", str(len(cells)))
+    rows, cols = grid_layout(len(cells))
+    header.set("rows", str(rows))
+    header.set("cols", str(cols))
+    if size is not None:
+        header.set("width", str(size[0]))
+        header.set("height", str(size[1]))
+    for cell_attributes in cells:
+        cell = etree.Element("cell")
+        for attribute, value in cell_attributes.items():
+            cell.set(attribute, str(value))
+        root.append(cell)
+
+    root.set("thumbnail", thumbnail)
+    if size is not None:
+        root.set("width", str(size[0]))
+        root.set("height", str(size[1]))
+    et = etree.ElementTree(root)
+    # write then rename so an interrupted save does
+    # not leave a truncated xml
+    tmp_file = "{}.tmp".format(file)
+    et.write(tmp_file, pretty_print=True)
+    os.replace(tmp_file, file)
+    # the xml now contains everything in the journal
+    try:
+        os.remove(journal_file(file))
+    except FileNotFoundError:
+        pass
+
+
+def read_header(file):
+    # dict of version, thumbnail, cells, rows, cols, width
+    # and height, read without parsing any cells of files
+    # with a header, width, height and thumbnail are None
+    # when they were not saved
+    from lxml import etree
+
+    header = {"version": 1, "thumbnail": None, "width": None, "height": None}
+    with open(file, "rb") as f:
+        for _, element in etree.iterparse(f, events=("start",)):
+            if element.tag == "grid":
+                header.update(element.attrib)
+            elif element.tag == "header":
+                header.update(element.attrib)
+                break
+            elif element.tag == "cell":
+                break
+    for attribute in ["version", "cells", "rows", "cols", "width", "height"]:
+        if header.get(attribute) is not None:
+            header[attribute] = int(header[attribute])
+    if "cells" not in header:
+        # count the cells of a version 1 file
+        header["cells"] = sum(1 for _ in read_cells(file))
+    # headers written before rows matched the laid out
+    # rows are corrected from the cell count
+    header["rows"], header["cols"] = grid_layout(header["cells"])
+    return header
+
+
+def read_cells(file, start=0, stop=None):
+    # yield attribute dicts of the cells from start up to
+    # stop in file order, which is position order for files
+    # written by write_grid
+    #
+    # cells are parsed one at a time and discarded so memory
+    # does not grow with the grid, reading stops at stop
+    from lxml import etree
+
+    with open(file, "rb") as f:
+        cells = etree.iterparse(f, events=("end",), tag="cell")
+        for index, (_, element) in enumerate(cells):
+            if stop is not None and index >= stop:
+                break
+            if index >= start:
+                yield dict(element.attrib)
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+
+def load_cells(file, start=0, stop=None):
+    # cells from start up to stop with journaled changes applied
+    return apply_journal(file, list(read_cells(file, start, stop)))
+
+
+def journal_append(file, cells):
+    # append changed cells as json lines and return
+    # the number of entries now in the journal
+    with open(journal_file(file), "a") as f:
+        for cell in cells:
+            entry = {"position": cell["position"], "source": cell["source"]}
+            for attribute in journaled_attributes:
+                if attribute in cell:
+                    entry[attribute] = str(cell[attribute])
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    return journal_length(file)
+
+
+def journal_length(file):
+    try:
+        with open(journal_file(file), "rb") as f:
+            return sum(1 for _ in f)
+    except FileNotFoundError:
+        return 0
+
+
+def journal_entries(file):
+    entries = []
+    try:
+        with open(journal_file(file), "r") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # a partially written last line
+                    # from an interrupted save
+                    pass
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def apply_journal(file, cells):
+    # replay journal entries over a list of cell attribute
+    # dicts, later entries win
+    entries = journal_entries(file)
+    if not entries:
+        return cells
+
+    positions = {}
+    for cell in cells:
+        positions[cell.get("position")] = cell
+
+    for entry in entries:
+        cell = positions.get(entry.get("position"))
+        if cell is None or cell.get("source") != entry.get("source"):
+            continue
+        for attribute in journaled_attributes:
+            if attribute in entry:
+                cell[attribute] = entry[attribute]
+    return cells
@@ -0,0 +1,180 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import collections
+import json
+import math
+import threading
+import time
+
+# timings and counts of named phases such as xml writes or
+# image decodes, recorded from any thread
+#
+# recording is off unless enable() is called, timer() then
+# returns a shared context that does nothing so instrumented
+# code costs a function call
+
+# samples kept per phase for histograms and percentiles
+sample_size = 2048
+
+
+class Phase(object):
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = collections.deque(maxlen=sample_size)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def histogram(self, bins=16):
+        # counts of samples in log spaced bins from 10us to 10s
+        counts = [0] * bins
+        low, high = math.log10(1e-5), math.log10(10)
+        for seconds in self.samples:
+            position = (math.log10(max(seconds, 1e-5)) - low) / (high - low)
+            counts[min(bins - 1, max(0, int(position * bins)))] += 1
+        return counts
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+        }
+
+
+class NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class Timer(object):
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+null_timer = NullTimer()
+enabled = False
+# when recording was enabled
+started = None
+phases = collections.OrderedDict()
+counts = collections.Counter()
+lock = threading.Lock()
+trace = None
+
+
+def enable(trace_file=None):
+    # start recording, with a json lines trace of every
+    # timing and count if trace_file is given
+    global enabled, started, trace
+    enabled = True
+    started = time.perf_counter()
+    if trace_file is not None:
+        trace = open(trace_file, "a")
+
+
+def timer(name):
+    if not enabled:
+        return null_timer
+    return Timer(name)
+
+
+def record(name, seconds):
+    if not enabled:
+        return
+    with lock:
+        if name not in phases:
+            phases[name] = Phase()
+        phases[name].add(seconds)
+        if trace is not None:
+            trace.write(
+                json.dumps({"time": time.time(), "phase": name, "seconds": seconds})
+                + "\n"
+            )
+
+
+def count(name, n=1):
+    if not enabled:
+        return
+    with lock:
+        counts[name] += n
+        if trace is not None:
+            trace.write(json.dumps({"time": time.time(), "count": name, "n": n}) + "\n")
+
+
+def snapshot():
+    # (name, summary, histogram) for each phase
+    with lock:
+        return [
+            (name, phase.summary(), phase.histogram()) for name, phase in phases.items()
+        ]
+
+
+def summary():
+    lines = []
+    for name, phase, _ in snapshot():
+        lines.append(
+            "{:<20} {:>8} {:>10.3f}ms {:>10.3f}ms {:>10.3f}ms {:>10.3f}ms".format(
+                name,
+                phase["count"],
+                phase["mean"] * 1000,
+                phase["p50"] * 1000,
+                phase["p95"] * 1000,
+                phase["max"] * 1000,
+            )
+        )
+    if lines:
+        lines.insert(
+            0,
+            "{:<20} {:>8} {:>12} {:>12} {:>12} {:>12}".format(
+                "phase", "count", "mean", "p50", "p95", "max"
+            ),
+        )
+    with lock:
+        for name, n in counts.items():
+            lines.append("{:<20} {:>8}".format(name, n))
+    return "\n".join(lines)
+
+
+def flush():
+    with lock:
+        if trace is not None:
+            trace.flush()
+
+
+def close():
+    # stop recording and close the trace
+    global enabled, trace
+    enabled = False
+    with lock:
+        if trace is not None:
+            trace.close()
+            trace = None
@@ -0,0 +1,152 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import mmap
+import os
+
+
+class TextSource(object):
+    # memory mapped text file read a window of lines at a time
+    #
+    # line offsets are indexed as lines are requested, lines
+    # far past the indexed part of the file are found from
+    # the average line length so any position opens in
+    # constant time. binary files are shown as a hex dump
+    def __init__(
+        self,
+        source,
+        sample_size=8192,
+        max_line_length=512,
+        index_budget=4 * 1024 * 1024,
+        bytes_per_row=16,
+    ):
+        self.source = source
+        self.max_line_length = max_line_length
+        # bytes scanned for newlines before estimating
+        self.index_budget = index_budget
+        self.bytes_per_row = bytes_per_row
+        self.mapped = None
+        self.size = 0
+        try:
+            with open(source, "rb") as f:
+                self.size = os.fstat(f.fileno()).st_size
+                if self.size > 0:
+                    self.mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, TypeError, ValueError):
+            pass
+        self.binary = self.is_binary(sample_size)
+        # start offsets of indexed lines
+        self.offsets = [0]
+        self.indexed = 0
+
+    def is_binary(self, sample_size):
+        if self.mapped is None:
+            return False
+        sample = self.mapped[:sample_size]
+        if b"\0" in sample:
+            return True
+        text_bytes = bytes(range(32, 127)) + b"\n\r\t\f\b"
+        non_text = sample.translate(None, text_bytes)
+        try:
+            sample.decode("utf-8")
+            return False
+        except UnicodeDecodeError as ex:
+            # a multibyte character cut off by the sample
+            if ex.start >= len(sample) - 4:
+                return False
+        return len(non_text) / len(sample) > 0.3
+
+    def index_to(self, line, budget=None):
+        # index line offsets until line or the budget of
+        # scanned bytes is reached
+        if budget is None:
+            budget = self.index_budget
+        stop = min(self.size, self.indexed + budget)
+        while len(self.offsets) <= line and self.indexed < stop:
+            newline = self.mapped.find(b"\n", self.indexed, stop)
+            if newline == -1:
+                self.indexed = stop
+                break
+            self.indexed = newline + 1
+            if self.indexed < self.size:
+                self.offsets.append(self.indexed)
+
+    @property
+    def fully_indexed(self):
+        return self.indexed >= self.size
+
+    def line_count(self):
+        if self.mapped is None:
+            return 0
+        if self.binary:
+            return -(-self.size // self.bytes_per_row)
+        if self.indexed == 0:
+            # index a sample to estimate from
+            self.index_to(self.size, budget=min(self.index_budget, 64 * 1024))
+        if self.fully_indexed:
+            return len(self.offsets)
+        # estimate from the lines indexed so far
+        return max(len(self.offsets), int(len(self.offsets) * self.size / self.indexed))
+
+    def line_offset(self, line):
+        self.index_to(line)
+        if line < len(self.offsets):
+            return self.offsets[line]
+        if self.fully_indexed:
+            return self.size
+        # past the indexed part, start at an estimated
+        # offset and move to the beginning of the next line
+        average = self.indexed / max(1, len(self.offsets))
+        offset = min(self.size, int(line * average))
+        newline = self.mapped.find(b"\n", offset, min(self.size, offset + 64 * 1024))
+        if newline == -1:
+            return offset
+        return newline + 1
+
+    def lines(self, start, count):
+        # decoded lines start to start + count
+        if self.mapped is None or count <= 0:
+            return []
+        if self.binary:
+            return [self.hex_line(line) for line in range(start, start + count)]
+
+        lines = []
+        offset = self.line_offset(start)
+        while len(lines) < count and offset < self.size:
+            stop = min(self.size, offset + self.max_line_length + 1)
+            end = self.mapped.find(b"\n", offset, stop)
+            if end == -1:
+                # long or unterminated line, show it in pieces
+                # cut before a utf-8 continuation byte
+                end = min(self.size, offset + self.max_line_length)
+                while end < self.size and end > offset + 1:
+                    if self.mapped[end] & 0xC0 != 0x80:
+                        break
+                    end -= 1
+                next_offset = end
+            else:
+                next_offset = end + 1
+            line = self.mapped[offset:end]
+            line = line.decode("utf-8", errors="replace").rstrip("\r")
+            lines.append(line.expandtabs())
+            offset = next_offset
+        return lines
+
+    def hex_line(self, line):
+        offset = line * self.bytes_per_row
+        row = self.mapped[offset : offset + self.bytes_per_row]
+        if not row:
+            return ""
+        hex_bytes = " ".join("{:02x}".format(b) for b in row)
+        printable = "".join(chr(b) if 32 <= b < 127 else "." for b in row)
+        return "{:08x}  {:<{}}  |{}|".format(
+            offset, hex_bytes, self.bytes_per_row * 3 - 1, printable
+        )
+
+    def close(self):
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
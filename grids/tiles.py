@@ -0,0 +1,230 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import hashlib
+import math
+import os
+import shutil
+import threading
+from PIL import Image as PILImage
+from grids import stats
+
+# tile pyramids for deep zoom, level 0 is the full image and
+# each level above it is half the size of the one below, up
+# to a level that fits in one tile
+#
+# tiles are stored as image files under a directory for each
+# level, a level is complete once its done file is written
+
+# pyramid sources may be far larger than the decompression
+# bomb limit. the limit is process wide, so it is lifted only
+# for the Image.open of a pyramid source, which reads just the
+# header, and the lock keeps one pyramid from restoring it
+# while another is opening
+large_images_lock = threading.Lock()
+
+
+def open_large_image(source):
+    with large_images_lock:
+        max_image_pixels = PILImage.MAX_IMAGE_PIXELS
+        PILImage.MAX_IMAGE_PIXELS = None
+        try:
+            return PILImage.open(source)
+        finally:
+            PILImage.MAX_IMAGE_PIXELS = max_image_pixels
+
+
+class TilePyramid(object):
+    def __init__(self, source, cache_dir, tile_size=256):
+        stat = os.stat(source)
+        key = "{}|{}|{}|{}".format(
+            os.path.abspath(source), stat.st_size, stat.st_mtime_ns, tile_size
+        )
+        self.key = hashlib.sha1(key.encode()).hexdigest()
+        self.source = source
+        self.directory = os.path.join(str(cache_dir), self.key)
+        self.tile_size = tile_size
+        with open_large_image(source) as img:
+            self.size = img.size
+            # keep transparency, otherwise jpeg is much smaller
+            self.tile_format = "png" if "A" in img.getbands() else "jpeg"
+        self.levels = max(0, math.ceil(math.log2(max(self.size) / self.tile_size))) + 1
+        self.lock = threading.Lock()
+        # levels known to be built
+        self.complete = set()
+
+    def level_size(self, level):
+        return (
+            max(1, math.ceil(self.size[0] / 2**level)),
+            max(1, math.ceil(self.size[1] / 2**level)),
+        )
+
+    def level_tiles(self, level):
+        # cols and rows of tiles at level
+        width, height = self.level_size(level)
+        return math.ceil(width / self.tile_size), math.ceil(height / self.tile_size)
+
+    def level_for(self, scale):
+        # coarsest level with at least scale shown
+        # pixels for each pixel of the source
+        if scale <= 0:
+            return self.levels - 1
+        level = int(math.floor(math.log2(1 / scale))) if scale < 1 else 0
+        return max(0, min(self.levels - 1, level))
+
+    def tile_file(self, level, col, row):
+        return os.path.join(
+            self.directory,
+            str(level),
+            "{}_{}.{}".format(col, row, "png" if self.tile_format == "png" else "jpg"),
+        )
+
+    def built(self, level):
+        if level not in self.complete:
+            if os.path.isfile(os.path.join(self.directory, str(level), "done")):
+                self.complete.add(level)
+        return level in self.complete
+
+    def build(self, level):
+        # write the tiles of level and of any coarser level
+        # not built yet, jpeg sources are decoded at the
+        # smallest scale that covers level
+        with self.lock:
+            if self.built(level):
+                return
+            with stats.timer("tile_build"):
+                with open_large_image(self.source) as img:
+                    img.draft("RGB", self.level_size(level))
+                    img = img.convert("RGBA" if self.tile_format == "png" else "RGB")
+                    if img.size != self.level_size(level):
+                        img = img.resize(self.level_size(level), PILImage.BILINEAR)
+                    for coarser in range(level, self.levels):
+                        if coarser > level:
+                            img = img.resize(
+                                self.level_size(coarser), PILImage.BILINEAR
+                            )
+                        if not self.built(coarser):
+                            self.write_level(coarser, img)
+                    img.close()
+        # mark the pyramid as used for eviction
+        os.utime(self.directory)
+
+    def write_level(self, level, img):
+        level_dir = os.path.join(self.directory, str(level))
+        os.makedirs(level_dir, exist_ok=True)
+        cols, rows = self.level_tiles(level)
+        for row in range(rows):
+            for col in range(cols):
+                box = (
+                    col * self.tile_size,
+                    row * self.tile_size,
+                    min(img.width, (col + 1) * self.tile_size),
+                    min(img.height, (row + 1) * self.tile_size),
+                )
+                tile = img.crop(box)
+                tile.save(self.tile_file(level, col, row), self.tile_format, quality=90)
+                tile.close()
+        with open(os.path.join(level_dir, "done"), "w"):
+            pass
+
+    def tile(self, level, col, row):
+        # (width, height, rgba pixels) of a tile, building
+        # the level first if needed
+        if not self.built(level):
+            self.build(level)
+        with stats.timer("tile_decode"):
+            with PILImage.open(self.tile_file(level, col, row)) as tile:
+                tile = tile.convert("RGBA")
+                return tile.width, tile.height, tile.tobytes()
+
+
+class TileStore(object):
+    # pyramids of images kept under cache_dir, least recently
+    # used pyramids are removed beyond max_bytes
+    def __init__(self, cache_dir, tile_size=256, max_bytes=4 * 1024 * 1024 * 1024):
+        self.cache_dir = str(cache_dir)
+        self.tile_size = tile_size
+        self.max_bytes = max_bytes
+        self.pyramids = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def pyramid(self, source):
+        stat = os.stat(source)
+        pyramid_key = (os.path.abspath(source), stat.st_size, stat.st_mtime_ns)
+        if pyramid_key not in self.pyramids:
+            self.pyramids[pyramid_key] = TilePyramid(
+                source, self.cache_dir, self.tile_size
+            )
+        return self.pyramids[pyramid_key]
+
+    def evict(self):
+        pyramids = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir():
+                continue
+            size = 0
+            for root, _, files in os.walk(entry.path):
+                for file in files:
+                    try:
+                        size += os.path.getsize(os.path.join(root, file))
+                    except OSError:
+                        pass
+            try:
+                pyramids.append((entry.stat().st_mtime, size, entry.path))
+            except OSError:
+                continue
+
+        total = sum(size for _, size, _ in pyramids)
+        for _, size, path in sorted(pyramids):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def visible_tiles(pyramid, level, content_size, window):
+    # tiles of level inside window, a (left, bottom, right,
+    # top) rect in the coordinates of the content the image
+    # is stretched over, with y up as in kivy
+    content_width, content_height = content_size
+    width, height = pyramid.level_size(level)
+    cols, rows = pyramid.level_tiles(level)
+    left, bottom, right, top = window
+    # image rows count down from the top
+    first_col = int(left * width / content_width // pyramid.tile_size)
+    last_col = int(math.ceil(right * width / content_width / pyramid.tile_size))
+    first_row = int(
+        (content_height - top) * height / content_height // pyramid.tile_size
+    )
+    last_row = int(
+        math.ceil(
+            (content_height - bottom) * height / content_height / pyramid.tile_size
+        )
+    )
+    return [
+        (col, row)
+        for row in range(max(0, first_row), min(rows, last_row))
+        for col in range(max(0, first_col), min(cols, last_col))
+    ]
+
+
+def tile_rect(pyramid, level, col, row, content_size):
+    # (x, y, width, height) of a tile in content coordinates
+    content_width, content_height = content_size
+    width, height = pyramid.level_size(level)
+    tile_width = min(pyramid.tile_size, width - col * pyramid.tile_size)
+    tile_height = min(pyramid.tile_size, height - row * pyramid.tile_size)
+    x = col * pyramid.tile_size * content_width / width
+    y = (
+        content_height
+        - (row * pyramid.tile_size + tile_height) * content_height / height
+    )
+    return (
+        x,
+        y,
+        tile_width * content_width / width,
+        tile_height * content_height / height,
+    )
@@ -0,0 +1,214 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+import time
+
+# watches files for changes on disk, with inotify where the
+# platform has it and by polling stat otherwise
+#
+# inotify watches the directories holding the files, so
+# files written to a temporary name and renamed over the
+# watched name are seen. changes are collected until no
+# event arrives for delay seconds, or for at most max_delay
+# while files keep changing, then callback is called on the
+# watcher thread with the set of changed paths
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+watch_mask = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+event_header = struct.Struct("iIII")
+
+
+class Inotify(object):
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # directory for each watch descriptor
+        self.directories = {}
+
+    def add(self, directory):
+        wd = self.libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), watch_mask | IN_ONLYDIR
+        )
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed", directory)
+        self.directories[wd] = directory
+        return wd
+
+    def remove(self, wd):
+        self.directories.pop(wd, None)
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout):
+        # paths with events, None when the queue overflowed
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as ex:
+            if ex.errno == errno.EAGAIN:
+                return set()
+            raise
+        paths = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = event_header.unpack_from(data, offset)
+            offset += event_header.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+            elif wd in self.directories and name:
+                paths.add(os.path.join(self.directories[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileWatcher(object):
+    def __init__(
+        self, callback, delay=0.2, max_delay=1, poll_interval=1, use_inotify=True
+    ):
+        self.callback = callback
+        self.delay = delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.files = set()
+        self.running = True
+        self.inotify = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify()
+            except (OSError, AttributeError) as ex:
+                print("inotify unavailable, polling: {}".format(ex))
+        # watch descriptors of watched directories
+        self.watches = {}
+        # (size, mtime) of files for polling
+        self.signatures = {}
+        if self.inotify is not None:
+            target = self.read_events
+        else:
+            target = self.poll
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+
+    @property
+    def mode(self):
+        return "inotify" if self.inotify is not None else "poll"
+
+    def watch(self, files):
+        # replace the watched files
+        files = set(os.path.abspath(file) for file in files)
+        with self.lock:
+            self.files = files
+            if self.inotify is not None:
+                directories = set(os.path.dirname(file) for file in files)
+                for directory in list(self.watches):
+                    if directory not in directories:
+                        self.inotify.remove(self.watches.pop(directory))
+                for directory in directories - set(self.watches):
+                    try:
+                        self.watches[directory] = self.inotify.add(directory)
+                    except OSError as ex:
+                        print(ex)
+            else:
+                self.signatures = {file: self.signature(file) for file in files}
+
+    def signature(self, file):
+        try:
+            stat = os.stat(file)
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    def read_events(self):
+        changed = set()
+        first_event = last_event = 0
+        while self.running:
+            try:
+                paths = self.inotify.read(self.delay)
+            except OSError as ex:
+                print(ex)
+                break
+            with self.lock:
+                if paths is None:
+                    # events were lost, assume everything changed
+                    paths = set(self.files)
+                paths &= self.files
+            now = time.monotonic()
+            if paths:
+                if not changed:
+                    first_event = now
+                changed |= paths
+                last_event = now
+            if changed and (
+                now - last_event >= self.delay or now - first_event >= self.max_delay
+            ):
+                self.notify(changed)
+                changed = set()
+        # closed here so the descriptor is not reused while
+        # the thread still reads from it
+        self.inotify.close()
+
+    def poll(self):
+        # changed files are reported once their signature
+        # has stayed the same for one more interval
+        pending = {}
+        while self.running:
+            time.sleep(self.poll_interval)
+            with self.lock:
+                files = list(self.files)
+            changed = set()
+            for file in files:
+                signature = self.signature(file)
+                with self.lock:
+                    if file not in self.signatures:
+                        continue
+                    if signature != self.signatures[file]:
+                        self.signatures[file] = signature
+                        pending[file] = signature
+                    elif file in pending:
+                        del pending[file]
+                        changed.add(file)
+            if changed:
+                self.notify(changed)
+
+    def notify(self, paths):
+        try:
+            self.callback(paths)
+        except Exception as ex:
+            print(ex)
+
+    def stop(self):
+        # the thread exits within delay or poll_interval
+        self.running = False
@@ -0,0 +1,90 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import collections
+import threading
+
+
+def merge_snapshots(older, newer):
+    # a grid snapshot that also saves the changes of an older
+    # snapshot that will not be saved. cells changed only in
+    # the older snapshot are taken from the newer cells, which
+    # hold their current state
+    current = {cell["position"]: cell for cell in newer["cells"]}
+    positions = set(cell["position"] for cell in newer["changed"])
+    changed = list(newer["changed"])
+    for cell in older["changed"]:
+        if cell["position"] in positions:
+            continue
+        cell = current.get(cell["position"], cell)
+        changed.append(cell)
+        positions.add(cell["position"])
+    merged = dict(newer)
+    merged["changed"] = changed
+    merged["rewrite"] = older["rewrite"] or newer["rewrite"]
+    return merged
+
+
+class SaveWorker(threading.Thread):
+    # runs save_function on snapshots in a background thread
+    #
+    # snapshots are coalesced by key: if a newer snapshot for
+    # the same key is submitted before the older one has been
+    # picked up, only the newest is saved, after merge_function
+    # has folded the older one into it
+    def __init__(self, save_function, merge_function=None, **kwargs):
+        self.save_function = save_function
+        self.merge_function = merge_function
+        self.condition = threading.Condition()
+        self.pending = collections.OrderedDict()
+        self.saving = None
+        self.stopped = False
+        super(SaveWorker, self).__init__(daemon=True, **kwargs)
+
+    def submit(self, key, snapshot):
+        with self.condition:
+            older = self.pending.pop(key, None)
+            if older is not None and self.merge_function is not None:
+                snapshot = self.merge_function(older, snapshot)
+            self.pending[key] = snapshot
+            self.condition.notify_all()
+
+    def busy(self, key=None):
+        if key is None:
+            return bool(self.pending) or self.saving is not None
+        return key in self.pending or self.saving == key
+
+    def flush(self, key=None):
+        # block until snapshots for key (or all snapshots)
+        # have been saved
+        with self.condition:
+            while self.busy(key) and self.is_alive():
+                self.condition.wait(0.1)
+
+    def stop(self):
+        # save anything still pending then exit
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopped:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                key, snapshot = self.pending.popitem(last=False)
+                self.saving = key
+            try:
+                self.save_function(snapshot)
+            except Exception as ex:
+                print(ex)
+            with self.condition:
+                self.saving = None
+                self.condition.notify_all()
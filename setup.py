@@ -11,8 +11,8 @@ setup(
     include_package_data=True,
     url="",
     packages=find_packages(),
-    install_requires=["Kivy", "Pillow", "xdg", "redis", "pre-commit"],
+    install_requires=["Kivy", "Pillow", "xdg", "redis>=3.5", "pre-commit"],
     entry_points={
-        "console_scripts": ["gg = grids.grid:main", "grids = grids.grid:main"]
+        "console_scripts": ["gg = grids.cli:main", "grids = grids.cli:main"]
     },
 )
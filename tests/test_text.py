@@ -0,0 +1,32 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+from grids.text import TextSource
+
+
+def test_long_lines_continue(tmp_path):
+    file = tmp_path / "long.txt"
+    file.write_text("a" * 600 + "\nTAIL\n")
+    source = TextSource(str(file))
+    try:
+        lines = source.lines(0, 10)
+    finally:
+        source.close()
+    assert [len(line) for line in lines] == [512, 88, 4]
+    assert "".join(lines[:2]) == "a" * 600
+
+
+def test_long_lines_split_on_characters(tmp_path):
+    file = tmp_path / "wide.txt"
+    text = "a" + "é" * 400
+    file.write_text(text + "\n", encoding="utf-8")
+    source = TextSource(str(file))
+    try:
+        lines = source.lines(0, 10)
+    finally:
+        source.close()
+    assert "".join(lines) == text
+    assert "�" not in "".join(lines)
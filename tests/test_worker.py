@@ -0,0 +1,67 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Copyright (c) 2018, Galen Curwen-McAdams
+
+import threading
+
+from grids import state
+from grids.worker import SaveWorker, merge_snapshots
+
+
+def cell(position, scroll_x):
+    return {
+        "position": str(position),
+        "source": "cell{}.png".format(position),
+        "scroll_x": scroll_x,
+    }
+
+
+def snapshot(file, cells, changed, rewrite=False):
+    return {"file": file, "cells": cells, "changed": changed, "rewrite": rewrite}
+
+
+def test_coalesced_saves_keep_older_changes(tmp_path):
+    file = str(tmp_path / "grid.xml")
+    blocker = str(tmp_path / "other.xml")
+    started = threading.Event()
+    release = threading.Event()
+    saved = []
+
+    def save(snapshot):
+        if snapshot["file"] == blocker:
+            started.set()
+            release.wait(5)
+            return
+        saved.append(snapshot)
+        state.journal_append(snapshot["file"], snapshot["changed"])
+
+    worker = SaveWorker(save, merge_snapshots)
+    worker.start()
+    try:
+        # keep the worker busy so both saves queue behind it
+        worker.submit(blocker, snapshot(blocker, [], []))
+        assert started.wait(5)
+
+        first = [cell(0, 0.11), cell(1, 0.5)]
+        worker.submit(file, snapshot(file, first, [first[0]]))
+        second = [cell(0, 0.11), cell(1, 0.22)]
+        worker.submit(file, snapshot(file, second, [second[1]], rewrite=True))
+        release.set()
+        worker.flush()
+    finally:
+        worker.stop()
+
+    assert len(saved) == 1
+    assert saved[0]["rewrite"]
+    cells = state.apply_journal(file, [cell(0, 0.5), cell(1, 0.5)])
+    assert [c["scroll_x"] for c in cells] == ["0.11", "0.22"]
+
+
+def test_merge_uses_current_cell_state():
+    older = snapshot("grid.xml", [cell(0, 0.1)], [cell(0, 0.1)])
+    newer = snapshot("grid.xml", [cell(0, 0.3)], [])
+    merged = merge_snapshots(older, newer)
+    assert merged["changed"] == [cell(0, 0.3)]
+    assert not merged["rewrite"]